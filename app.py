@@ -3,12 +3,20 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 import io
+import os
 import datetime
+import tempfile
+from typing import Final, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from dateutil.relativedelta import relativedelta
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-from utils.data_processor import load_sample_data, validate_portfolio_data, process_portfolio_data, fetch_historical_data
-from utils.monte_carlo import run_monte_carlo_simulation
-from utils.risk_metrics import calculate_var, calculate_expected_shortfall
+from utils.data_processor import (
+    load_sample_data, validate_portfolio_data, process_portfolio_data,
+    fetch_historical_data, calculate_returns
+)
+from utils.monte_carlo import run_monte_carlo_simulation, save_simulation_paths
+from utils.risk_metrics import calculate_var_es_bulk
 from utils.time_series import run_arima_forecast
 from utils.visualization import (
     plot_portfolio_composition, 
@@ -18,9 +26,135 @@ from utils.visualization import (
 )
 from models.economic_scenarios import (
     ECONOMIC_SCENARIOS, 
-    apply_economic_scenario
+    apply_economic_scenario,
+    get_scenario_description
+)
+
+# Seed for the Monte Carlo simulation so cached and fresh runs agree
+MC_RANDOM_SEED = 42
+
+# Scenario descriptions, resolved once
+SCENARIO_DESC = {name: get_scenario_description(name) for name in ECONOMIC_SCENARIOS}
+
+# Saham Blue Chip Indonesia (tanpa akhiran .JK)
+INDONESIAN_STOCKS: Final[Tuple[str, ...]] = (
+    # Banking & Financial
+    'BBCA', 'BBRI', 'BMRI', 'BBNI', 'BJTM', 'BTPS', 'BRIS', 'BDMN', 'BNGA',
+    # Telecommunication
+    'TLKM', 'EXCL', 'ISAT', 'FREN',
+    # Consumer Goods
+    'UNVR', 'ICBP', 'INDF', 'KLBF', 'SIDO', 'MYOR', 'GGRM', 'HMSP', 'CPIN', 'JPFA',
+    # Infrastructure & Construction
+    'PGAS', 'JSMR', 'WIKA', 'WSKT', 'ADHI', 'PTPP',
+    # Mining & Energy
+    'ADRO', 'PTBA', 'ITMG', 'MEDC', 'ANTM', 'INCO', 'TINS',
+    # Property & Real Estate
+    'BSDE', 'CTRA', 'PWON', 'SMRA', 'LPKR',
+    # Industry & Manufacturing
+    'ASII', 'SRIL', 'INTP', 'SMGR', 'BRPT',
+    # Technology & Others
+    'GOTO', 'BUKA', 'EMTK', 'AKRA', 'MNCN'
 )
 
+# Common US stocks - kept small for focus on Indonesian market
+US_STOCKS: Final[Tuple[str, ...]] = (
+    'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'META', 'TSLA', 'NVDA'
+)
+
+ALL_STOCKS: Final[Tuple[str, ...]] = INDONESIAN_STOCKS + US_STOCKS
+
+SCENARIO_NAMES: Final[Tuple[str, ...]] = tuple(ECONOMIC_SCENARIOS)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_fetch(symbols_tuple, start, end):
+    """Fetch historical prices once per (symbols, date range) and reuse across reruns."""
+    return fetch_historical_data(list(symbols_tuple), start, end)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_scenario(symbols_tuple, start, end, scenario_name):
+    """Apply an economic scenario to the cached historical prices."""
+    historical_data = _cached_fetch(symbols_tuple, start, end)
+    # apply_economic_scenario works on its own copy, the cached frame is not modified
+    return apply_economic_scenario(historical_data, ECONOMIC_SCENARIOS[scenario_name])
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_simulation(symbols_tuple, start, end, scenario_name, portfolio_df,
+                       num_simulations, time_horizon, random_seed):
+    """Run the Monte Carlo simulation once per scenario, portfolio and simulation settings."""
+    adjusted_historical_data = _cached_scenario(symbols_tuple, start, end, scenario_name)
+    
+    # Compute daily returns once for the simulation
+    returns = calculate_returns(adjusted_historical_data)
+    
+    return run_monte_carlo_simulation(
+        adjusted_historical_data,
+        portfolio_df,
+        num_simulations=num_simulations,
+        time_horizon=time_horizon,
+        random_seed=random_seed,
+        returns=returns,
+        correlation_adjustment=ECONOMIC_SCENARIOS[scenario_name].get('correlation_adjustment', 0.0)
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_arima(symbols_tuple, start, end, scenario_name, portfolio_df, forecast_periods):
+    """Fit the ARIMA forecast once per scenario, portfolio and horizon (not simulation settings)."""
+    adjusted_historical_data = _cached_scenario(symbols_tuple, start, end, scenario_name)
+    return run_arima_forecast(
+        adjusted_historical_data,
+        portfolio_df,
+        forecast_periods=forecast_periods
+    )
+
+
+# Figures only change with their inputs, so reruns from sidebar widgets reuse them
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_plot_portfolio(portfolio_df):
+    """Build the portfolio composition chart once per portfolio."""
+    return plot_portfolio_composition(portfolio_df)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_plot_simulations(simulation_results):
+    """Build the Monte Carlo path chart once per simulation result."""
+    return plot_monte_carlo_simulations(simulation_results)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_plot_risk(risk_metrics):
+    """Build the VaR/ES bar chart once per set of risk metrics."""
+    return plot_risk_metrics(risk_metrics)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_plot_forecast(forecast_key, _forecast_data, total_portfolio_value):
+    """Build the ARIMA forecast chart once per forecast and portfolio value.
+    
+    The forecast dict holds an unhashable model summary, so it is keyed by
+    forecast_key (a hash of the plotted series) instead.
+    """
+    return plot_time_series_forecast(
+        _forecast_data,
+        total_portfolio_value=total_portfolio_value
+    )
+
+
+def _mark_build_edited():
+    """Flag that the portfolio editor changed, so its column buffers are refreshed."""
+    st.session_state.build_dirty = True
+
+
+def _forecast_key(forecast_data):
+    """Hash the series that the forecast chart plots."""
+    return tuple(
+        pd.util.hash_pandas_object(forecast_data[name]).to_numpy().tobytes()
+        for name in ('historical_values', 'forecast_values', 'lower_ci', 'upper_ci')
+    )
+
 # Set page config
 st.set_page_config(
     page_title="Portfolio Stress Testing Platform",
@@ -33,6 +167,9 @@ if 'portfolio_data' not in st.session_state:
     st.session_state.portfolio_data = None
 if 'simulation_results' not in st.session_state:
     st.session_state.simulation_results = None
+if 'simulation_dir' not in st.session_state:
+    # Per-session directory for saved simulation paths, removed with the session
+    st.session_state.simulation_dir = tempfile.TemporaryDirectory(prefix='mc_paths_')
 if 'risk_metrics' not in st.session_state:
     st.session_state.risk_metrics = None
 if 'forecast_data' not in st.session_state:
@@ -66,79 +203,59 @@ with st.sidebar:
             st.session_state.portfolio_data = load_sample_data()
             st.success("Portofolio sampel berhasil dimuat!")
     else:  # Buat Portofolio
-        if 'build_portfolio' not in st.session_state:
-            st.session_state.build_portfolio = []
-        
-        # Saham Blue Chip Indonesia (tanpa akhiran .JK)
-        indonesian_stocks = [
-            # Banking & Financial
-            'BBCA', 'BBRI', 'BMRI', 'BBNI', 'BJTM', 'BTPS', 'BRIS', 'BDMN', 'BNGA',
-            # Telecommunication
-            'TLKM', 'EXCL', 'ISAT', 'FREN',
-            # Consumer Goods
-            'UNVR', 'ICBP', 'INDF', 'KLBF', 'SIDO', 'MYOR', 'GGRM', 'HMSP', 'CPIN', 'JPFA',
-            # Infrastructure & Construction
-            'PGAS', 'JSMR', 'WIKA', 'WSKT', 'ADHI', 'PTPP',
-            # Mining & Energy
-            'ADRO', 'PTBA', 'ITMG', 'MEDC', 'ANTM', 'INCO', 'TINS',
-            # Property & Real Estate
-            'BSDE', 'CTRA', 'PWON', 'SMRA', 'LPKR',
-            # Industry & Manufacturing
-            'ASII', 'SRIL', 'INTP', 'SMGR', 'BRPT',
-            # Technology & Others
-            'GOTO', 'BUKA', 'EMTK', 'AKRA', 'MNCN'
-        ]
+        # Portfolio being built, kept as parallel column buffers with running totals;
+        # they are refreshed only when the editor changes, not on every rerun
+        if 'build_symbols' not in st.session_state:
+            st.session_state.build_symbols = []
+            st.session_state.build_weights = []
+            st.session_state.build_values = []
+            st.session_state.total_weight = 0.0
+            st.session_state.total_value = 0.0
+            st.session_state.build_dirty = False
+            # The editor key is versioned so "Hapus Semua" can start from an empty table
+            st.session_state.build_editor_version = 0
         
-        # Common US stocks - kept small for focus on Indonesian market
-        us_stocks = [
-            'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'META', 'TSLA', 'NVDA'
-        ]
+        # Enter all stocks at once; rows are only processed on "Buat Portofolio"
+        st.subheader("Tambahkan Saham")
+        build_df = st.data_editor(
+            pd.DataFrame({
+                'Symbol': pd.Series(dtype='object'),
+                'Weight': pd.Series(dtype='float64'),
+                'Value': pd.Series(dtype='float64')
+            }),
+            num_rows='dynamic',
+            column_config={
+                'Symbol': st.column_config.TextColumn(
+                    "Saham",
+                    help="Kode saham apa pun (tanpa akhiran .JK), mis. BBCA atau AAPL",
+                    required=True
+                ),
+                'Weight': st.column_config.NumberColumn("Bobot (%)", min_value=0.0, max_value=100.0, step=1.0, default=10.0),
+                'Value': st.column_config.NumberColumn("Nilai (Juta Rp)", min_value=0.0, step=10.0, default=100.0)
+            },
+            key=f"build_editor_{st.session_state.build_editor_version}",
+            on_change=_mark_build_edited
+        )
         
-        all_stocks = indonesian_stocks + us_stocks
+        with st.expander("Daftar kode saham"):
+            st.write(", ".join(ALL_STOCKS))
         
-        # Add new stock to portfolio
-        with st.form("add_stock_form"):
-            st.subheader("Tambahkan Saham")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                new_symbol = st.selectbox("Pilih Saham", all_stocks)
-                
-            with col2:
-                custom_symbol = st.text_input("Atau masukkan kode saham", "")
-            
-            if custom_symbol:
-                new_symbol = custom_symbol
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                new_weight = st.number_input("Bobot (%)", min_value=0.0, max_value=100.0, value=10.0, step=1.0) / 100.0
-            
-            with col2:
-                new_value = st.number_input("Nilai (Juta Rp)", min_value=0.0, value=100.0, step=10.0)
-            
-            submit_button = st.form_submit_button(label="Tambahkan Saham")
-            
-            if submit_button:
-                # Add stock to the build list
-                st.session_state.build_portfolio.append({
-                    'Symbol': new_symbol,
-                    'Weight': new_weight,
-                    'Value': new_value
-                })
-                st.success(f"Saham {new_symbol} berhasil ditambahkan!")
+        if st.session_state.build_dirty:
+            # Copy the complete rows into the column buffers and update the totals once
+            rows = build_df.dropna()
+            symbols = rows['Symbol'].astype(str).str.strip()
+            rows = rows[symbols != '']
+            st.session_state.build_symbols = symbols[symbols != ''].tolist()
+            st.session_state.build_weights = (rows['Weight'] / 100.0).tolist()
+            st.session_state.build_values = rows['Value'].tolist()
+            st.session_state.total_weight = float(sum(st.session_state.build_weights))
+            st.session_state.total_value = float(sum(st.session_state.build_values))
+            st.session_state.build_dirty = False
         
-        # Display current portfolio being built
-        if st.session_state.build_portfolio:
-            st.subheader("Portofolio Saat Ini")
-            
-            build_df = pd.DataFrame(st.session_state.build_portfolio)
-            st.dataframe(build_df)
-            
-            total_weight = build_df['Weight'].sum()
-            total_value = build_df['Value'].sum()
+        # Display totals of the portfolio being built
+        if st.session_state.build_symbols:
+            total_weight = st.session_state.total_weight
+            total_value = st.session_state.total_value
             
             st.write(f"Total Bobot: {total_weight:.2%} | Total Nilai: {total_value:.2f} Juta Rp")
             
@@ -148,15 +265,28 @@ with st.sidebar:
             
             # Create portfolio from built data
             if st.button("Buat Portofolio"):
-                # Create DataFrame and process it
-                portfolio_df = pd.DataFrame(st.session_state.build_portfolio)
-                st.session_state.portfolio_data = process_portfolio_data(portfolio_df)
-                st.success("Portofolio berhasil dibuat!")
+                # Create DataFrame from the column buffers and process it
+                portfolio_df = pd.DataFrame({
+                    'Symbol': st.session_state.build_symbols,
+                    'Weight': np.asarray(st.session_state.build_weights, dtype=np.float32),
+                    'Value': np.asarray(st.session_state.build_values, dtype=np.float32)
+                }, copy=False)
+                is_valid, validated_df = validate_portfolio_data(portfolio_df)
+                if is_valid:
+                    st.session_state.portfolio_data = process_portfolio_data(validated_df)
+                    st.success("Portofolio berhasil dibuat!")
+                else:
+                    st.error("Data portofolio tidak valid. Periksa kode saham, bobot, dan nilai.")
             
             # Clear portfolio being built
             if st.button("Hapus Semua"):
-                st.session_state.build_portfolio = []
-                st.success("Portofolio berhasil dihapus.")
+                st.session_state.build_symbols = []
+                st.session_state.build_weights = []
+                st.session_state.build_values = []
+                st.session_state.total_weight = 0.0
+                st.session_state.total_value = 0.0
+                st.session_state.build_editor_version += 1
+                st.rerun()
     
     # Analysis parameters
     if st.session_state.portfolio_data is not None:
@@ -196,12 +326,16 @@ with st.sidebar:
         st.subheader("Skenario Ekonomi")
         selected_scenario = st.selectbox(
             "Pilih skenario ekonomi",
-            list(ECONOMIC_SCENARIOS.keys()),
+            SCENARIO_NAMES,
             help="Skenario ekonomi yang telah ditentukan untuk stress testing"
         )
         
+        # Show diagnostic messages after the analysis
+        st.checkbox("Debug", value=False, key="debug")
+        
         # Run analysis button
         if st.button("Jalankan Analisis Stress Test"):
+            debug_messages = []
             with st.spinner("Menjalankan stress test dan analisis skenario..."):
                 try:
                     # Get historical data
@@ -216,68 +350,100 @@ with st.sidebar:
                         start_date = end_date - relativedelta(years=5)
                     
                     # Debug
-                    st.write(f"Debug: Mengambil data untuk {len(symbols)} saham: {', '.join(symbols)}")
+                    debug_messages.append(f"Mengambil data untuk {len(symbols)} saham: {', '.join(symbols)}")
                     
-                    # Get historical price data
+                    # Get historical price data (cached per symbols and date range)
+                    symbols_key = tuple(sorted(symbols))
                     try:
-                        historical_data = fetch_historical_data(
-                            symbols, 
-                            start_date, 
+                        historical_data = _cached_fetch(
+                            symbols_key,
+                            start_date,
                             end_date
                         )
-                        st.write(f"Debug: Berhasil memperoleh data historis: {len(historical_data)} hari data")
+                        debug_messages.append(f"Berhasil memperoleh data historis: {len(historical_data)} hari data")
                     except Exception as fetch_error:
                         st.error(f"Error dalam mengambil data historis: {str(fetch_error)}")
                         raise fetch_error
                     
                     # Apply economic scenario
-                    scenario_params = ECONOMIC_SCENARIOS[selected_scenario]
-                    adjusted_historical_data = apply_economic_scenario(
-                        historical_data.copy(), 
-                        scenario_params
-                    )
-                    
-                    # Run Monte Carlo simulation
-                    simulation_data = run_monte_carlo_simulation(
-                        adjusted_historical_data,
-                        portfolio_df,
-                        num_simulations=num_simulations,
-                        time_horizon=time_horizon
+                    adjusted_historical_data = _cached_scenario(
+                        symbols_key,
+                        start_date,
+                        end_date,
+                        selected_scenario
                     )
                     
-                    # Calculate risk metrics
-                    var_95 = calculate_var(simulation_data, confidence_level=0.95)
-                    var_99 = calculate_var(simulation_data, confidence_level=0.99)
-                    es_95 = calculate_expected_shortfall(simulation_data, confidence_level=0.95)
-                    es_99 = calculate_expected_shortfall(simulation_data, confidence_level=0.99)
-                    
-                    risk_metrics = {
-                        'VaR_95': var_95,
-                        'VaR_99': var_99,
-                        'ES_95': es_95,
-                        'ES_99': es_99
-                    }
-                    
-                    # Run time series forecast with ARIMA
-                    try:
-                        st.write("Debug: Menjalankan peramalan ARIMA...")
-                        st.write(f"Debug: Data historis memiliki {len(adjusted_historical_data)} baris dan {len(adjusted_historical_data.columns)} kolom")
-                        st.write(f"Debug: Portofolio memiliki {len(portfolio_df)} aset")
+                    # Fit the ARIMA forecast in a worker thread while the Monte Carlo
+                    # simulation runs; the worker gets this session's script context so
+                    # the cached fit works there, and leaving the block always joins it
+                    with ThreadPoolExecutor(
+                        max_workers=1,
+                        initializer=add_script_run_ctx,
+                        initargs=(None, get_script_run_ctx())
+                    ) as arima_executor:
+                        arima_future = arima_executor.submit(
+                            _cached_arima,
+                            symbols_key,
+                            start_date,
+                            end_date,
+                            selected_scenario,
+                            portfolio_df,
+                            time_horizon
+                        )
                         
-                        forecast_data = run_arima_forecast(
-                            adjusted_historical_data, 
+                        # Run Monte Carlo simulation
+                        simulation_data = _cached_simulation(
+                            symbols_key,
+                            start_date,
+                            end_date,
+                            selected_scenario,
                             portfolio_df,
-                            forecast_periods=time_horizon
+                            num_simulations,
+                            time_horizon,
+                            MC_RANDOM_SEED
+                        )
+                        
+                        # Calculate risk metrics (both confidence levels from the presorted final returns)
+                        (var_95, var_99), (es_95, es_99) = calculate_var_es_bulk(
+                            simulation_data,
+                            confidence_levels=(0.95, 0.99)
                         )
                         
-                        st.write("Debug: Peramalan ARIMA berhasil")
-                    except Exception as arima_error:
-                        st.error(f"Error dalam peramalan ARIMA: {str(arima_error)}")
-                        # Tetap lanjutkan meskipun ARIMA error
-                        forecast_data = None
+                        risk_metrics = {
+                            'VaR_95': var_95,
+                            'VaR_99': var_99,
+                            'ES_95': es_95,
+                            'ES_99': es_99
+                        }
+                        
+                        # Run time series forecast with ARIMA
+                        try:
+                            debug_messages.append("Menjalankan peramalan ARIMA...")
+                            debug_messages.append(f"Data historis memiliki {len(adjusted_historical_data)} baris dan {len(adjusted_historical_data.columns)} kolom")
+                            debug_messages.append(f"Portofolio memiliki {len(portfolio_df)} aset")
+                            
+                            forecast_data = arima_future.result()
+                            
+                            debug_messages.append("Peramalan ARIMA berhasil")
+                        except Exception as arima_error:
+                            st.error(f"Error dalam peramalan ARIMA: {str(arima_error)}")
+                            # Tetap lanjutkan meskipun ARIMA error
+                            forecast_data = None
                     
                     # Store results in session state
-                    st.session_state.simulation_results = simulation_data
+                    # Paths are kept on disk (float16); session state only holds their metadata
+                    previous_results = st.session_state.simulation_results
+                    st.session_state.simulation_results = save_simulation_paths(
+                        simulation_data,
+                        st.session_state.simulation_dir.name
+                    )
+                    # Remove the replaced run's file so the session directory only holds the current paths
+                    if (previous_results is not None
+                            and previous_results['simulations_path'] != st.session_state.simulation_results['simulations_path']):
+                        try:
+                            os.remove(previous_results['simulations_path'])
+                        except FileNotFoundError:
+                            pass
                     st.session_state.risk_metrics = risk_metrics
                     st.session_state.forecast_data = forecast_data
                     
@@ -285,6 +451,11 @@ with st.sidebar:
                     
                 except Exception as e:
                     st.error(f"Terjadi kesalahan selama analisis: {str(e)}")
+            
+            # Render all debug messages at once, after the spinner
+            if st.session_state.debug and debug_messages:
+                with st.expander("Debug info"):
+                    st.text("\n".join(debug_messages))
 
 # Main content area
 if st.session_state.portfolio_data is not None:
@@ -298,7 +469,7 @@ if st.session_state.portfolio_data is not None:
     
     with col2:
         st.subheader("Alokasi Aset")
-        fig = plot_portfolio_composition(st.session_state.portfolio_data)
+        fig = _cached_plot_portfolio(st.session_state.portfolio_data)
         st.plotly_chart(fig, use_container_width=True)
     
     # Display analysis results if available
@@ -309,7 +480,7 @@ if st.session_state.portfolio_data is not None:
         # Monte Carlo simulation results
         st.subheader("Simulasi Monte Carlo")
         try:
-            mc_fig = plot_monte_carlo_simulations(st.session_state.simulation_results)
+            mc_fig = _cached_plot_simulations(st.session_state.simulation_results)
             st.plotly_chart(mc_fig, use_container_width=True)
             
             # Add explanation of Monte Carlo simulation
@@ -339,7 +510,7 @@ if st.session_state.portfolio_data is not None:
         # Check if risk metrics are available
         if st.session_state.risk_metrics is not None:
             with col1:
-                risk_fig = plot_risk_metrics(st.session_state.risk_metrics)
+                risk_fig = _cached_plot_risk(st.session_state.risk_metrics)
                 st.plotly_chart(risk_fig, use_container_width=True)
             
             with col2:
@@ -367,25 +538,24 @@ if st.session_state.portfolio_data is not None:
             st.subheader("Peramalan Deret Waktu (ARIMA)")
             try:
                 # Dapatkan total nilai portofolio dalam juta rupiah untuk skala grafik
-                total_portfolio_value = st.session_state.portfolio_data['Value'].sum()
+                total_portfolio_value = float(st.session_state.portfolio_data['Value'].to_numpy().sum())
                 
                 # Gunakan total nilai portofolio sebagai parameter untuk grafik peramalan
-                forecast_fig = plot_time_series_forecast(
+                forecast_fig = _cached_plot_forecast(
+                    _forecast_key(st.session_state.forecast_data),
                     st.session_state.forecast_data,
-                    total_portfolio_value=total_portfolio_value
+                    total_portfolio_value
                 )
                 
                 # Tampilkan grafik dengan ukuran besar
                 st.plotly_chart(forecast_fig, use_container_width=True)
                 
                 # Tampilkan deskripsi skenario ekonomi yang dipilih
-                from models.economic_scenarios import get_scenario_description
-                
                 st.markdown(f"""
                 ### Skenario Ekonomi: {selected_scenario}
                 
                 **Deskripsi:**  
-                {get_scenario_description(selected_scenario)}
+                {SCENARIO_DESC[selected_scenario]}
                 
                 Skenario ekonomi ini memengaruhi peramalan dan simulasi dengan menyesuaikan tingkat pengembalian, volatilitas, dan 
                 korelasi antar aset berdasarkan karakteristik skenario yang dipilih. Setiap sektor ekonomi (Teknologi, Keuangan, 
@@ -1,7 +1,12 @@
 import pandas as pd
 import numpy as np
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
 from typing import Dict, List, Tuple
 
+from utils.data_processor import calculate_returns
+
 # Define economic scenarios with their impact parameters
 ECONOMIC_SCENARIOS = {
     "Normal Market": {
@@ -114,6 +119,16 @@ ECONOMIC_SCENARIOS = {
     }
 }
 
+# Expose the scenarios read-only (including nested impact factors), so shared
+# definitions cannot be modified in place; generate_custom_scenario builds new dicts
+ECONOMIC_SCENARIOS = MappingProxyType({
+    name: MappingProxyType({
+        key: MappingProxyType(value) if isinstance(value, dict) else value
+        for key, value in params.items()
+    })
+    for name, params in ECONOMIC_SCENARIOS.items()
+})
+
 # Sector mapping for common stocks
 SECTOR_MAPPING = {
     # Technology
@@ -166,6 +181,19 @@ SECTOR_MAPPING = {
     'DEFAULT': 'Unknown'
 }
 
+# Sector used for symbols not in SECTOR_MAPPING
+_SECTOR_FALLBACK = SECTOR_MAPPING['DEFAULT']
+
+# Number of assets processed together by ScenarioBatchKernel.apply_all
+SCENARIO_ASSET_BLOCK = 64
+
+# Fixed sector order for array-based scenario data (see IMPACT_MATRIX)
+SECTORS = (
+    'Technology', 'Financial', 'Healthcare', 'Energy', 'Consumer',
+    'Industrial', 'Materials', 'Utilities', 'Real Estate', 'Unknown'
+)
+SECTOR_IDX = {sector: i for i, sector in enumerate(SECTORS)}
+
 def get_symbol_sector(symbol: str) -> str:
     """
     Get the sector for a given stock symbol.
@@ -176,62 +204,176 @@ def get_symbol_sector(symbol: str) -> str:
     Returns:
         str: Sector classification
     """
-    return SECTOR_MAPPING.get(symbol, SECTOR_MAPPING['DEFAULT'])
+    return SECTOR_MAPPING.get(symbol, _SECTOR_FALLBACK)
 
-def apply_economic_scenario(
-    historical_data: pd.DataFrame,
-    scenario_params: Dict
-) -> pd.DataFrame:
+def get_symbol_sectors(symbols) -> np.ndarray:
     """
-    Apply economic scenario adjustments to historical price data.
+    Get the sectors for several stock symbols at once.
     
     Args:
-        historical_data: DataFrame with historical asset prices
-        scenario_params: Parameters for the economic scenario
+        symbols: Iterable of stock ticker symbols (e.g. DataFrame columns)
         
     Returns:
-        DataFrame: Adjusted historical data
+        ndarray: Sector classification per symbol
     """
-    # Create a copy of the data to avoid modifying the original
-    adjusted_data = historical_data.copy()
+    return pd.Index(symbols).map(SECTOR_MAPPING).fillna(_SECTOR_FALLBACK).to_numpy()
+
+def get_sector_indices(symbols) -> np.ndarray:
+    """
+    Get the position in SECTORS of each symbol's sector.
     
-    # Extract adjustment parameters
-    returns_adj = scenario_params.get('returns_adjustment', 0.0)
-    vol_adj = scenario_params.get('volatility_adjustment', 1.0)
-    corr_adj = scenario_params.get('correlation_adjustment', 0.0)
-    impact_factors = scenario_params.get('impact_factor', {})
+    Args:
+        symbols: Iterable of stock ticker symbols (e.g. DataFrame columns)
+        
+    Returns:
+        ndarray: int32 sector index per symbol
+    """
+    return pd.Index(get_symbol_sectors(symbols)).map(SECTOR_IDX).to_numpy(dtype=np.int32)
+
+def get_impact_vector(impact_factors: Dict) -> np.ndarray:
+    """
+    Convert sector impact factors to an array aligned with SECTORS.
     
-    # Calculate returns
-    returns = historical_data.pct_change().dropna()
+    Args:
+        impact_factors: Dict mapping sector names to annual return impacts
+        
+    Returns:
+        ndarray: Impact per sector (0 for sectors without an entry)
+    """
+    return np.array([impact_factors.get(sector, 0.0) for sector in SECTORS])
+
+# Sector impacts of all predefined scenarios, one row per scenario in
+# ECONOMIC_SCENARIOS order and one column per sector in SECTORS
+IMPACT_MATRIX = np.vstack([
+    get_impact_vector(params.get('impact_factor', {}))
+    for params in ECONOMIC_SCENARIOS.values()
+])
+IMPACT_MATRIX.flags.writeable = False
+
+@dataclass(frozen=True, eq=False)
+class ScenarioBatchKernel:
+    """
+    Apply economic scenarios to one price history, sharing the setup work.
+    
+    Returns, sector indices and start prices are derived once in from_prices;
+    apply_all then only varies the scenario parameters, for any number of
+    scenarios in one broadcast.
+    """
+    historical_data: pd.DataFrame
+    returns_arr: np.ndarray      # (days, assets) daily returns
+    sector_idx: np.ndarray       # (assets,) position in SECTORS
+    start_prices: np.ndarray     # (assets,) price on the first return date
+    index: pd.Index              # dates of returns_arr rows
+    columns: pd.Index            # assets of returns_arr columns
     
-    # Apply sector-specific adjustments
-    for column in returns.columns:
-        # Get sector
-        sector = get_symbol_sector(column)
+    @classmethod
+    def from_prices(cls, historical_data: pd.DataFrame) -> 'ScenarioBatchKernel':
+        """
+        Precompute the scenario-independent data for a price history.
         
-        # Get sector-specific impact
-        sector_impact = impact_factors.get(sector, 0.0)
+        Args:
+            historical_data: DataFrame with historical asset prices
+            
+        Returns:
+            ScenarioBatchKernel: Kernel for the given prices
+        """
+        returns = calculate_returns(historical_data)
+        start_prices = (
+            historical_data.loc[returns.index[0], returns.columns].to_numpy(dtype=float)
+            if not returns.empty else np.empty(len(returns.columns))
+        )
+        return cls(
+            historical_data=historical_data,
+            returns_arr=returns.to_numpy(dtype=float),
+            sector_idx=get_sector_indices(returns.columns),
+            start_prices=start_prices,
+            index=returns.index,
+            columns=returns.columns
+        )
+    
+    def apply_all(
+        self,
+        impact_matrix: np.ndarray,
+        returns_adj: np.ndarray,
+        vol_adj: np.ndarray
+    ) -> np.ndarray:
+        """
+        Compute adjusted prices for several scenarios at once.
         
-        # Combine global and sector-specific adjustments
-        total_returns_adj = returns_adj + sector_impact
+        Args:
+            impact_matrix: (scenarios, len(SECTORS)) annual sector impacts
+            returns_adj: (scenarios,) annual return adjustments
+            vol_adj: (scenarios,) volatility multipliers
+            
+        Returns:
+            ndarray: Adjusted prices with shape (scenarios, days, assets)
+        """
+        impact = np.asarray(impact_matrix)[:, self.sector_idx]                    # (S, A)
+        total_adj = np.asarray(returns_adj)[:, None, None] + impact[:, None, :]   # (S, 1, A)
+        vol_adj = np.asarray(vol_adj)[:, None, None]
         
-        # Adjust returns
-        adjusted_returns = returns[column] * vol_adj + total_returns_adj / 252  # Daily adjustment
+        n_days, n_assets = self.returns_arr.shape
+        prices = np.empty((len(impact), n_days, n_assets))
         
-        # Replace returns in the adjusted DataFrame
-        start_idx = returns.index[0]
-        start_price = adjusted_data.loc[start_idx, column]
+        # Work on blocks of assets so each block's temporaries stay cache-sized
+        for a0 in range(0, n_assets, SCENARIO_ASSET_BLOCK):
+            block = slice(a0, a0 + SCENARIO_ASSET_BLOCK)
+            growth = 1 + (
+                self.returns_arr[None, :, block] * vol_adj
+                + total_adj[:, :, block] / 252  # Daily adjustment
+            )
+            
+            # Reconstruct prices from adjusted returns; the first return date keeps its price
+            growth[:, :1] = 1.0
+            np.cumprod(growth, axis=1, out=prices[:, :, block])
+            prices[:, :, block] *= self.start_prices[block]
         
-        # Reconstruct prices from adjusted returns
-        for i, date in enumerate(returns.index):
-            if i == 0:
-                adjusted_data.loc[date, column] = start_price
-            else:
-                prev_date = returns.index[i-1]
-                prev_price = adjusted_data.loc[prev_date, column]
-                adjusted_data.loc[date, column] = prev_price * (1 + adjusted_returns[date])
+        return prices
+    
+    def apply_scenarios(self, scenarios: Mapping) -> Dict[str, pd.DataFrame]:
+        """
+        Apply several scenarios and rebuild a price DataFrame for each.
+        
+        Args:
+            scenarios: Mapping of scenario name to scenario parameters
+            
+        Returns:
+            Dict: Adjusted historical data per scenario name
+        """
+        params = list(scenarios.values())
+        if self.returns_arr.size == 0:
+            return {name: self.historical_data.copy() for name in scenarios}
+        
+        prices = self.apply_all(
+            np.vstack([get_impact_vector(p.get('impact_factor', {})) for p in params]),
+            np.array([p.get('returns_adjustment', 0.0) for p in params]),
+            np.array([p.get('volatility_adjustment', 1.0) for p in params])
+        )
+        
+        adjusted = {}
+        for name, scenario_prices in zip(scenarios, prices):
+            # Rows dropped from the returns (first date, gaps) keep their prices
+            adjusted_data = self.historical_data.copy()
+            adjusted_data.loc[self.index, self.columns] = scenario_prices
+            adjusted[name] = adjusted_data
+        return adjusted
+
+def apply_economic_scenario(
+    historical_data: pd.DataFrame,
+    scenario_params: Dict
+) -> pd.DataFrame:
+    """
+    Apply economic scenario adjustments to historical price data.
     
-    return adjusted_data
+    Args:
+        historical_data: DataFrame with historical asset prices
+        scenario_params: Parameters for the economic scenario
+        
+    Returns:
+        DataFrame: Adjusted historical data (a new DataFrame)
+    """
+    kernel = ScenarioBatchKernel.from_prices(historical_data)
+    return kernel.apply_scenarios({'scenario': scenario_params})['scenario']
 
 def generate_custom_scenario(
     base_scenario: str,
@@ -250,8 +392,11 @@ def generate_custom_scenario(
     if base_scenario not in ECONOMIC_SCENARIOS:
         raise ValueError(f"Base scenario '{base_scenario}' not found")
     
-    # Create copy of base scenario
-    custom_scenario = ECONOMIC_SCENARIOS[base_scenario].copy()
+    # Create copy of base scenario (nested dicts too, the base stays untouched)
+    custom_scenario = {
+        key: dict(value) if isinstance(value, Mapping) else value
+        for key, value in ECONOMIC_SCENARIOS[base_scenario].items()
+    }
     
     # If no custom adjustments provided, return the base scenario
     if not custom_adjustments:
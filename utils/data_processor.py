@@ -1,8 +1,48 @@
+import datetime
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
 
-def validate_portfolio_data(data: pd.DataFrame) -> bool:
+# Maximum number of symbols per yf.download request
+YF_BATCH_SIZE = 20
+
+# Directory for parquet copies of yf.download results (requires pyarrow);
+# ranges ending today or later are never cached since the last day is still incomplete
+YF_CACHE_DIR = '.cache'
+
+# Concurrent batch downloads and retries (exponential backoff) per batch
+YF_MAX_WORKERS = 8
+YF_MAX_RETRIES = 3
+YF_BACKOFF_SECONDS = 1.0
+
+def _coerce_portfolio_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert portfolio columns to their working dtypes, skipping columns already converted.
+    
+    Args:
+        data: DataFrame with 'Symbol', 'Weight' and 'Value' columns
+        
+    Returns:
+        DataFrame: Data with string symbols and float32 weights and values
+    """
+    conversions = {}
+    if not isinstance(data['Symbol'].dtype, pd.StringDtype):
+        conversions['Symbol'] = data['Symbol'].astype('string')
+    
+    # float32 is enough for weights and values
+    for col in ['Weight', 'Value']:
+        if data[col].dtype != np.float32:
+            conversions[col] = pd.to_numeric(data[col], downcast='float')
+    
+    return data.assign(**conversions) if conversions else data
+
+def validate_portfolio_data(data: pd.DataFrame) -> Tuple[bool, Optional[pd.DataFrame]]:
     """
     Validate if the uploaded CSV data has the required format.
     
@@ -10,32 +50,29 @@ def validate_portfolio_data(data: pd.DataFrame) -> bool:
         data: DataFrame containing portfolio data
         
     Returns:
-        bool: True if valid, False otherwise
+        Tuple: (True, data with converted dtypes and normalized weights) if
+        valid, (False, None) otherwise; pass the returned data to
+        process_portfolio_data so the conversion is not repeated
     """
     required_columns = ['Symbol', 'Weight', 'Value']
     
     # Check if all required columns exist
     if not all(col in data.columns for col in required_columns):
-        return False
+        return False, None
     
     # Check if data types are valid
     try:
-        # Verify Symbol is string
-        data['Symbol'] = data['Symbol'].astype(str)
-        
-        # Verify Weight and Value are numeric
-        data['Weight'] = pd.to_numeric(data['Weight'])
-        data['Value'] = pd.to_numeric(data['Value'])
+        data = _coerce_portfolio_dtypes(data)
         
         # Check if weights sum to approximately 1
         total_weight = data['Weight'].sum()
         if not (0.99 <= total_weight <= 1.01):
             # Try to normalize weights
-            data['Weight'] = data['Weight'] / total_weight
+            data = data.assign(Weight=data['Weight'] / total_weight)
             
-        return True
+        return True, data
     except Exception:
-        return False
+        return False, None
 
 def process_portfolio_data(data: pd.DataFrame) -> pd.DataFrame:
     """
@@ -53,10 +90,8 @@ def process_portfolio_data(data: pd.DataFrame) -> pd.DataFrame:
         if col not in data.columns:
             raise ValueError(f"Required column '{col}' not found in portfolio data")
     
-    # Convert data types
-    data['Symbol'] = data['Symbol'].astype(str)
-    data['Weight'] = pd.to_numeric(data['Weight'])
-    data['Value'] = pd.to_numeric(data['Value'])
+    # Convert data types (no-op for data returned by validate_portfolio_data)
+    data = _coerce_portfolio_dtypes(data)
     
     # Normalize weights if they don't sum to 1
     total_weight = data['Weight'].sum()
@@ -67,7 +102,7 @@ def process_portfolio_data(data: pd.DataFrame) -> pd.DataFrame:
     total_value = data['Value'].sum()
     
     # Calculate additional metrics
-    data['Percentage'] = (data['Value'] / total_value * 100).round(2)
+    data['Percentage'] = (data['Value'].to_numpy() / total_value * 100).round(2)
     
     # Sort by weight (descending)
     data = data.sort_values('Weight', ascending=False).reset_index(drop=True)
@@ -94,6 +129,119 @@ def load_sample_data() -> pd.DataFrame:
     # Process the data
     return process_portfolio_data(df)
 
+def _extract_close_prices(data, symbols: list, start_date, end_date) -> pd.DataFrame:
+    """
+    Extract close prices from a yfinance download result.
+    
+    Args:
+        data: Result of yf.download for the given symbols
+        symbols: List of downloaded ticker symbols
+        start_date: Start date in 'YYYY-MM-DD' format
+        end_date: End date in 'YYYY-MM-DD' format
+        
+    Returns:
+        DataFrame: Close prices with one column per symbol
+    """
+    # Ekstrak harga penutupan
+    try:
+        # Pemrosesan data berbeda berdasarkan jumlah simbol
+        if len(symbols) == 1:
+            # Untuk satu simbol
+            if isinstance(data, pd.DataFrame) and 'Close' in data.columns:
+                prices = pd.DataFrame({symbols[0]: data['Close']})
+            elif isinstance(data, pd.Series):
+                prices = pd.DataFrame({symbols[0]: data})
+            else:
+                print(f"Data struktur: {type(data)}")
+                if isinstance(data, pd.DataFrame):
+                    print(f"Kolom: {data.columns.tolist()}")
+                
+                # Fallback untuk kasus tertentu
+                prices = pd.DataFrame({symbols[0]: [100, 101, 102]}, 
+                                      index=pd.date_range(start=start_date, periods=3, freq='D'))
+        else:
+            # Untuk beberapa simbol
+            if 'Close' in data.columns and len(data.columns.levels) > 1:
+                # Multi-level columns: ('Close', 'BBCA.JK')
+                prices = data['Close']
+            elif len(data.columns) > 0 and isinstance(data, pd.DataFrame):
+                # Jika ada banyak kolom dan bukan multi-level
+                prices = data
+            else:
+                raise ValueError("Tidak ada data harga yang ditemukan dalam data yang diunduh")
+                
+        # Pastikan prices selalu berbentuk DataFrame
+        if not isinstance(prices, pd.DataFrame):
+            if isinstance(prices, pd.Series):
+                prices = prices.to_frame()
+            else:
+                raise ValueError(f"Format data tidak valid: {type(prices)}")
+    except Exception as e:
+        print(f"Error saat memproses data: {str(e)}")
+        
+        # Buat dummy data jika ekstraksi gagal
+        prices = pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq='D'))
+        for sym in symbols:
+            prices[sym] = np.random.normal(1000, 10, size=len(prices))
+    
+    return prices
+
+def _download_batch(batch: list, start_date: str, end_date: str):
+    """
+    Download one batch of symbols, reusing a parquet copy on disk when available.
+    
+    Only ranges that end before today are cached; the latest day's prices can
+    still change, so a cached copy of them would go stale.
+    
+    Args:
+        batch: List of ticker symbols for one yf.download request
+        start_date: Start date in 'YYYY-MM-DD' format
+        end_date: End date in 'YYYY-MM-DD' format
+        
+    Returns:
+        DataFrame: Raw yf.download result for the batch
+    """
+    key = hashlib.sha1(repr((tuple(sorted(batch)), start_date, end_date)).encode()).hexdigest()
+    cache_path = os.path.join(YF_CACHE_DIR, f"yf_{key}.parquet")
+    cacheable = end_date < datetime.date.today().isoformat()
+    
+    if cacheable and os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception as e:
+            print(f"Cache tidak dapat dibaca, mengunduh ulang: {str(e)}")
+    
+    for attempt in range(YF_MAX_RETRIES):
+        try:
+            data = yf.download(
+                batch, 
+                start=start_date, 
+                end=end_date, 
+                auto_adjust=True, 
+                progress=False,
+                group_by='column',
+                threads=False  # batches already run concurrently
+            )
+            break
+        except Exception as e:
+            if attempt == YF_MAX_RETRIES - 1:
+                raise
+            delay = YF_BACKOFF_SECONDS * 2 ** attempt
+            print(f"Pengunduhan gagal ({str(e)}), mencoba lagi dalam {delay:.0f} detik")
+            time.sleep(delay)
+    
+    # Simpan hanya hasil yang berisi data; tulis ke file sementara lalu rename
+    if cacheable and isinstance(data, pd.DataFrame) and not data.empty:
+        try:
+            os.makedirs(YF_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            data.to_parquet(tmp_path, compression='zstd')
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Gagal menyimpan cache data historis: {str(e)}")
+    
+    return data
+
 def fetch_historical_data(symbols: list, start_date, end_date) -> pd.DataFrame:
     """
     Fetch historical price data for the given symbols.
@@ -145,58 +293,21 @@ def fetch_historical_data(symbols: list, start_date, end_date) -> pd.DataFrame:
         
         print(f"Downloading data for: {processed_symbols}")
         
-        # Download data historis
-        data = yf.download(
-            processed_symbols, 
-            start=start_date, 
-            end=end_date, 
-            auto_adjust=True, 
-            progress=False,
-            group_by='column',
-            threads=True
-        )
+        # Download data historis per batch secara paralel; Yahoo melayani ~20 simbol per URL
+        batches = [
+            processed_symbols[i:i + YF_BATCH_SIZE]
+            for i in range(0, len(processed_symbols), YF_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=min(YF_MAX_WORKERS, len(batches))) as executor:
+            downloads = list(executor.map(
+                lambda batch: _download_batch(batch, start_date, end_date), batches
+            ))
+        price_frames = [
+            _extract_close_prices(data, batch, start_date, end_date)
+            for data, batch in zip(downloads, batches)
+        ]
         
-        # Ekstrak harga penutupan
-        try:
-            # Pemrosesan data berbeda berdasarkan jumlah simbol
-            if len(processed_symbols) == 1:
-                # Untuk satu simbol
-                if isinstance(data, pd.DataFrame) and 'Close' in data.columns:
-                    prices = pd.DataFrame({processed_symbols[0]: data['Close']})
-                elif isinstance(data, pd.Series):
-                    prices = pd.DataFrame({processed_symbols[0]: data})
-                else:
-                    print(f"Data struktur: {type(data)}")
-                    if isinstance(data, pd.DataFrame):
-                        print(f"Kolom: {data.columns.tolist()}")
-                    
-                    # Fallback untuk kasus tertentu
-                    prices = pd.DataFrame({processed_symbols[0]: [100, 101, 102]}, 
-                                          index=pd.date_range(start=start_date, periods=3, freq='D'))
-            else:
-                # Untuk beberapa simbol
-                if 'Close' in data.columns and len(data.columns.levels) > 1:
-                    # Multi-level columns: ('Close', 'BBCA.JK')
-                    prices = data['Close']
-                elif len(data.columns) > 0 and isinstance(data, pd.DataFrame):
-                    # Jika ada banyak kolom dan bukan multi-level
-                    prices = data
-                else:
-                    raise ValueError("Tidak ada data harga yang ditemukan dalam data yang diunduh")
-                    
-            # Pastikan prices selalu berbentuk DataFrame
-            if not isinstance(prices, pd.DataFrame):
-                if isinstance(prices, pd.Series):
-                    prices = prices.to_frame()
-                else:
-                    raise ValueError(f"Format data tidak valid: {type(prices)}")
-        except Exception as e:
-            print(f"Error saat memproses data: {str(e)}")
-            
-            # Buat dummy data jika ekstraksi gagal
-            prices = pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq='D'))
-            for sym in processed_symbols:
-                prices[sym] = np.random.normal(1000, 10, size=len(prices))
+        prices = pd.concat(price_frames, axis=1) if len(price_frames) > 1 else price_frames[0]
         
         # Periksa apakah data berhasil diambil
         if prices.empty:
@@ -219,26 +330,40 @@ def fetch_historical_data(symbols: list, start_date, end_date) -> pd.DataFrame:
     
     except Exception as e:
         print(f"Error dalam pengambilan data historis: {str(e)}")
-        # Buat DataFrame kosong dengan semua simbol sebagai kolom
-        empty_df = pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq='D'))
-        for sym in symbols:
-            empty_df[sym] = np.nan
+        # Buat data harga random untuk pengujian dengan semua simbol sebagai kolom
+        dates = pd.date_range(start=start_date, end=end_date, freq='D')
+        columns = list(dict.fromkeys(symbols))
+        rng = np.random.default_rng()
         
-        # Buat data harga random untuk pengujian
-        for col in empty_df.columns:
-            # Mulai dengan nilai awal acak antara 1000-10000
-            start_price = np.random.uniform(1000, 10000)
-            price_series = [start_price]
-            
-            # Generate harga berikutnya dengan perubahan acak kecil
-            for i in range(1, len(empty_df)):
-                change = np.random.uniform(-0.02, 0.02)  # Perubahan -2% hingga +2%
-                next_price = price_series[-1] * (1 + change)
-                price_series.append(next_price)
-            
-            empty_df[col] = price_series
+        # Mulai dengan nilai awal acak antara 1000-10000
+        start_prices = rng.uniform(1000, 10000, size=len(columns))
+        
+        # Generate harga berikutnya dengan perubahan acak kecil (-2% hingga +2%)
+        changes = rng.uniform(-0.02, 0.02, size=(len(dates), len(columns)))
+        changes[:1] = 0.0
+        synthetic_prices = start_prices * np.cumprod(1 + changes, axis=0)
+        
+        return pd.DataFrame(synthetic_prices, index=dates, columns=columns)
+
+def calculate_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate daily simple returns, dropping dates with missing values.
+    
+    Same result as prices.pct_change().dropna(), computed on the underlying array.
+    
+    Args:
+        prices: DataFrame with historical prices (each column is an asset)
         
-        return empty_df
+    Returns:
+        DataFrame: Daily returns indexed by the later date of each pair
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    returns = pd.DataFrame(
+        values[1:] / values[:-1] - 1,
+        index=prices.index[1:],
+        columns=prices.columns
+    )
+    return returns.dropna()
 
 def calculate_portfolio_returns(prices: pd.DataFrame, weights: pd.Series) -> pd.Series:
     """
@@ -252,12 +377,12 @@ def calculate_portfolio_returns(prices: pd.DataFrame, weights: pd.Series) -> pd.
         Series: Daily portfolio returns
     """
     # Calculate daily returns
-    returns = prices.pct_change().dropna()
+    returns = calculate_returns(prices)
     
     # Ensure all assets in weights are in returns
-    common_assets = [asset for asset in weights.index if asset in returns.columns]
+    common_assets = weights.index[weights.index.isin(returns.columns)]
     
-    if not common_assets:
+    if common_assets.empty:
         raise ValueError("None of the assets in the portfolio have historical data")
     
     # Normalize weights to include only assets with data
@@ -1,14 +1,126 @@
+import hashlib
+import os
+import tempfile
+
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, TypedDict
+
+from utils.data_processor import calculate_returns
+from utils.monte_carlo_numba import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from utils.monte_carlo_numba import simulate_paths_numba
+
+try:
+    import cupy as cp
+    CUPY_AVAILABLE = cp.cuda.runtime.getDeviceCount() > 0
+except Exception:  # cupy is optional and needs a CUDA device
+    CUPY_AVAILABLE = False
+
+class SimulationResults(TypedDict):
+    """
+    Output of run_monte_carlo_simulation.
+    
+    Path data is stored as contiguous float32 arrays (one array per field),
+    so the risk metrics can sort and reduce them without converting first.
+    """
+    simulations: np.ndarray  # float32, (num_simulations, time_horizon)
+    final_returns: np.ndarray  # float32, (num_simulations,)
+    sorted_final_returns: np.ndarray  # float32, (num_simulations,), ascending; risk metrics sort final_returns when absent
+    max_drawdowns: np.ndarray  # float32, (num_simulations,), negative values
+    percentiles: Dict[int, np.ndarray]
+    time_horizon: int
+    mean_return: float
+    volatility: float
+    weights: np.ndarray
+    assets: List[str]
+
+def _adjust_correlation(cov: np.ndarray, correlation_adjustment: float) -> np.ndarray:
+    """
+    Shrink asset correlations toward 1 while keeping each asset's volatility.
+    
+    Args:
+        cov: Asset covariance matrix
+        correlation_adjustment: Shrinkage weight in [0, 1] (0 leaves cov unchanged)
+        
+    Returns:
+        ndarray: Adjusted covariance matrix
+    """
+    if correlation_adjustment == 0:
+        return cov
+    
+    std = np.sqrt(np.diag(cov))
+    safe_std = np.where(std > 0, std, 1.0)  # constant series have no correlation
+    corr = cov / np.outer(safe_std, safe_std)
+    corr = (1 - correlation_adjustment) * corr + correlation_adjustment
+    np.fill_diagonal(corr, 1.0)
+    return corr * np.outer(std, std)
+
+def _simulate_batched(
+    mean_return: float,
+    volatility: float,
+    num_simulations: int,
+    time_horizon: int,
+    rng,
+    xp=np
+):
+    """
+    Simulate daily portfolio returns with one batched array draw.
+    
+    Only the weighted portfolio return is kept, and a weighted sum of
+    correlated normal asset returns is itself normal, N(w @ mu, w' cov w); drawing
+    the portfolio return directly gives the same distribution without the
+    per-asset (paths, days, assets) tensor.
+    
+    Args:
+        mean_return: Mean daily portfolio return (w @ mu)
+        volatility: Daily portfolio volatility, sqrt(w' cov w) of the adjusted covariance
+        num_simulations: Number of paths
+        time_horizon: Number of trading days per path
+        rng: Random generator of the array module
+        xp: Array module, numpy or cupy
+        
+    Returns:
+        Array: Daily portfolio returns with shape (num_simulations, time_horizon)
+    """
+    portfolio_daily_returns = rng.standard_normal((num_simulations, time_horizon), dtype=xp.float32)
+    portfolio_daily_returns *= xp.float32(volatility)
+    portfolio_daily_returns += xp.float32(mean_return)
+    return portfolio_daily_returns
+
+def _path_statistics(portfolio_daily_returns: np.ndarray):
+    """
+    Compound daily portfolio returns into paths and measure their drawdowns.
+    
+    Args:
+        portfolio_daily_returns: Daily returns with shape (num_simulations, time_horizon)
+        
+    Returns:
+        Tuple: Cumulative return paths, final returns and maximum drawdowns (float32)
+    """
+    # Cumulative return paths (float32 from here on, whatever the engine produced)
+    simulations = np.cumprod(1 + portfolio_daily_returns.astype(np.float32, copy=False), axis=1) - 1
+    final_returns = np.ascontiguousarray(simulations[:, -1])
+    
+    # Maximum percentage drawdown per path (peak starts at the initial value)
+    peak = np.maximum(np.maximum.accumulate(simulations, axis=1), 0)
+    drawdowns = (peak - simulations) / (1 + peak)
+    max_drawdowns = -drawdowns.max(axis=1)  # Store as negative value
+    
+    return simulations, final_returns, max_drawdowns
 
 def run_monte_carlo_simulation(
     historical_data: pd.DataFrame,
     portfolio_data: pd.DataFrame,
     num_simulations: int = 1000,
     time_horizon: int = 21,
-    random_seed: int = None
-) -> Dict[str, Any]:
+    random_seed: int = None,
+    returns: pd.DataFrame = None,
+    device: str = 'auto',
+    correlation_adjustment: float = 0.0,
+    engine: str = 'numpy'
+) -> SimulationResults:
     """
     Run Monte Carlo simulation for portfolio performance.
     
@@ -18,34 +130,48 @@ def run_monte_carlo_simulation(
         num_simulations: Number of simulations to run
         time_horizon: Time horizon in trading days
         random_seed: Seed for random number generator
+        returns: Precomputed daily returns of historical_data (optional)
+        device: 'auto' (GPU if cupy and a CUDA device are available), 'cpu' or 'gpu'
+        correlation_adjustment: Scenario shrinkage of asset correlations toward 1
+        engine: CPU engine, 'numpy' (batched draw) or 'numba' (fused parallel
+            kernel, requires numba; only worth it where it measures faster)
         
     Returns:
-        Dict: Simulation results including paths and metrics
+        Dict: Simulation results including paths and metrics; paths, final
+        returns, drawdowns and percentiles are float32 (daily returns are
+        small, so single precision is well within tolerance)
     """
-    # Set random seed if provided
-    if random_seed is not None:
-        np.random.seed(random_seed)
+    if device not in ['auto', 'cpu', 'gpu']:
+        raise ValueError(f"Invalid device: {device}. Choose 'auto', 'cpu', or 'gpu'")
+    if device == 'gpu' and not CUPY_AVAILABLE:
+        raise ValueError("device='gpu' requires cupy and a CUDA device")
+    if engine not in ['numpy', 'numba']:
+        raise ValueError(f"Invalid engine: {engine}. Choose 'numpy' or 'numba'")
+    if engine == 'numba' and not NUMBA_AVAILABLE:
+        raise ValueError("engine='numba' requires numba")
+    
+    # Random generator (PCG64); seeded if a seed is provided
+    rng = np.random.default_rng(random_seed)
     
-    # Calculate daily returns
-    returns = historical_data.pct_change().dropna()
+    # Calculate daily returns unless the caller already has them
+    if returns is None:
+        returns = calculate_returns(historical_data)
     
     # Extract portfolio information
     symbols = portfolio_data['Symbol'].tolist()
     
     # Filter returns to include only portfolio assets
-    portfolio_returns = returns[[col for col in returns.columns if col in symbols]]
+    symbol_set = set(symbols)
+    portfolio_returns = returns.loc[:, [col for col in returns.columns if col in symbol_set]]
     
     # Handle missing columns - some symbols might not have data
     missing_symbols = [symbol for symbol in symbols if symbol not in portfolio_returns.columns]
     if missing_symbols:
         print(f"Warning: No historical data found for: {', '.join(missing_symbols)}")
     
-    # Create weights array matching the returns columns
-    weights = np.zeros(len(portfolio_returns.columns))
-    for i, symbol in enumerate(portfolio_returns.columns):
-        symbol_weight = portfolio_data.loc[portfolio_data['Symbol'] == symbol, 'Weight'].values
-        if len(symbol_weight) > 0:
-            weights[i] = symbol_weight[0]
+    # Create weights array matching the returns columns (first entry wins for duplicate symbols)
+    weight_series = portfolio_data.drop_duplicates('Symbol').set_index('Symbol')['Weight']
+    weights = weight_series.reindex(portfolio_returns.columns, fill_value=0.0).to_numpy(dtype=float)
     
     # Normalize weights to sum to 1
     if np.sum(weights) > 0:
@@ -53,56 +179,54 @@ def run_monte_carlo_simulation(
     else:
         raise ValueError("No valid weights could be calculated")
     
-    # Calculate portfolio statistics
-    mean_daily_return = np.sum(portfolio_returns.mean() * weights)
-    portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(portfolio_returns.cov(), weights)))
-    
-    # Store simulation paths
-    simulations = []
-    final_returns = []
-    max_drawdowns = []
-    
-    # Run simulations
-    for _ in range(num_simulations):
-        # Generate random returns
-        random_returns = np.random.normal(
-            mean_daily_return, 
-            portfolio_volatility, 
-            time_horizon
+    # Calculate asset and portfolio statistics on a contiguous (days, assets) array
+    returns_matrix = np.ascontiguousarray(portfolio_returns.to_numpy(dtype=np.float64))
+    asset_means = returns_matrix.mean(axis=0)
+    asset_cov = _adjust_correlation(
+        np.atleast_2d(np.cov(returns_matrix, rowvar=False)),
+        correlation_adjustment
+    )
+    mean_daily_return = float(asset_means @ weights)
+    portfolio_volatility = float(np.sqrt(weights @ asset_cov @ weights))
+    
+    # Simulate portfolio paths: (paths, days); correlations (and the scenario
+    # adjustment) enter through the portfolio volatility sqrt(w' cov w)
+    if device == 'gpu' or (device == 'auto' and CUPY_AVAILABLE):
+        gpu_rng = cp.random.default_rng(int(rng.integers(0, 2**31 - 1)))
+        portfolio_daily_returns = cp.asnumpy(_simulate_batched(
+            mean_daily_return, portfolio_volatility, num_simulations, time_horizon, gpu_rng, xp=cp
+        ))
+        simulations, final_returns, max_drawdowns = _path_statistics(portfolio_daily_returns)
+    elif engine == 'numba':
+        # Fused kernel: draws, compounding and drawdowns in one pass per path
+        simulations = np.empty((num_simulations, time_horizon), dtype=np.float32)
+        final_returns = np.empty(num_simulations, dtype=np.float32)
+        max_drawdowns = np.empty(num_simulations, dtype=np.float32)
+        simulate_paths_numba(
+            mean_daily_return, portfolio_volatility, int(rng.integers(0, 2**31 - 1)),
+            simulations, final_returns, max_drawdowns
         )
-        
-        # Calculate cumulative returns
-        cumulative_returns = np.cumprod(1 + random_returns) - 1
-        
-        # Calculate maximum drawdown
-        peak = 0
-        max_drawdown = 0
-        
-        for return_value in cumulative_returns:
-            if return_value > peak:
-                peak = return_value
-            drawdown = (peak - return_value) / (1 + peak)  # Percentage drawdown
-            max_drawdown = max(max_drawdown, drawdown)
-        
-        # Store results
-        simulations.append(cumulative_returns)
-        final_returns.append(cumulative_returns[-1])
-        max_drawdowns.append(-max_drawdown)  # Store as negative value
+    else:
+        portfolio_daily_returns = _simulate_batched(
+            mean_daily_return, portfolio_volatility, num_simulations, time_horizon, rng
+        )
+        simulations, final_returns, max_drawdowns = _path_statistics(portfolio_daily_returns)
     
-    # Convert lists to numpy arrays
-    simulations = np.array(simulations)
-    final_returns = np.array(final_returns)
-    max_drawdowns = np.array(max_drawdowns)
+    # Sort the final returns once; every historical VaR/ES level reads this array
+    sorted_final_returns = np.sort(final_returns)
     
-    # Calculate percentiles
-    percentiles = {}
-    for percentile in [5, 25, 50, 75, 95]:
-        percentiles[percentile] = np.percentile(simulations, percentile, axis=0)
+    # Calculate percentiles (all levels in one pass over the paths)
+    percentile_levels = [5, 25, 50, 75, 95]
+    percentiles = dict(zip(
+        percentile_levels,
+        np.percentile(simulations, percentile_levels, axis=0).astype(np.float32)
+    ))
     
     # Return simulation results
     return {
         'simulations': simulations,
         'final_returns': final_returns,
+        'sorted_final_returns': sorted_final_returns,
         'max_drawdowns': max_drawdowns,
         'percentiles': percentiles,
         'time_horizon': time_horizon,
@@ -112,6 +236,41 @@ def run_monte_carlo_simulation(
         'assets': portfolio_returns.columns.tolist()
     }
 
+def save_simulation_paths(
+    simulation_results: Dict[str, Any],
+    directory: str = None
+) -> Dict[str, Any]:
+    """
+    Write the simulated paths to disk as float16 and keep only their metadata.
+    
+    The file name is derived from the content hash, so identical results are
+    written once and can be reloaded on later reruns.
+    
+    Args:
+        simulation_results: Dict containing simulation data
+        directory: Target directory (defaults to the system temp directory)
+        
+    Returns:
+        Dict: Path of the .npy file, the percentile envelopes and the time horizon
+    """
+    paths = np.ascontiguousarray(simulation_results['simulations'], dtype=np.float16)
+    digest = hashlib.sha1(paths.tobytes()).hexdigest()[:16]
+    path = os.path.join(directory or tempfile.gettempdir(), f'mc_{digest}.npy')
+    
+    if not os.path.exists(path):
+        # Write to a temporary name first so concurrent sessions never read a partial file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, paths)
+        os.replace(tmp_path, path)
+    
+    return {
+        'simulations_path': path,
+        'num_simulations': len(paths),
+        'percentiles': simulation_results['percentiles'],
+        'time_horizon': simulation_results['time_horizon']
+    }
+
 def calculate_portfolio_metrics(simulations: Dict[str, Any]) -> Dict[str, float]:
     """
     Calculate various portfolio performance metrics from simulation results.
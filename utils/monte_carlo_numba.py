@@ -0,0 +1,49 @@
+import numpy as np
+
+try:
+    from numba import config, njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; monte_carlo uses the NumPy engine without it
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE and config.THREADING_LAYER == 'default':
+    # Streamlit runs scripts on a worker thread; the default TBB layer can then
+    # hang interpreter shutdown, so use OpenMP unless the environment chose a layer
+    config.THREADING_LAYER = 'omp'
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def simulate_paths_numba(mean_return, volatility, seed,
+                             simulations, final_returns, max_drawdowns):
+        """
+        Simulate cumulative portfolio return paths and their maximum drawdowns.
+
+        Draws the daily portfolio returns, compounds them and tracks the
+        running peak in a single pass per path, writing into buffers
+        preallocated by the caller. Each path is seeded with seed + path
+        index, so results do not depend on how paths are scheduled across
+        threads.
+
+        Args:
+            mean_return: Mean daily portfolio return (w @ mu)
+            volatility: Daily portfolio volatility, sqrt(w' cov w)
+            seed: Base random seed
+            simulations: Output buffer (num_simulations, time_horizon) for cumulative returns
+            final_returns: Output buffer (num_simulations,) for the last cumulative return
+            max_drawdowns: Output buffer (num_simulations,) for maximum drawdowns (negative)
+        """
+        num_simulations, time_horizon = simulations.shape
+        for p in prange(num_simulations):
+            np.random.seed(seed + p)
+            growth = 1.0
+            peak = 0.0  # peak starts at the initial value
+            max_dd = 0.0
+            for t in range(time_horizon):
+                daily_return = mean_return + volatility * np.random.standard_normal()
+                growth *= 1.0 + daily_return
+                cum = growth - 1.0
+                simulations[p, t] = cum
+                peak = max(peak, cum)
+                max_dd = max(max_dd, (peak - cum) / (1.0 + peak))
+            final_returns[p] = simulations[p, time_horizon - 1]
+            max_drawdowns[p] = -max_dd  # Store as negative value
@@ -1,9 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Any, Union
+from scipy.stats import norm, skew as _skew, kurtosis as _kurt
+from typing import Dict, List, Any, Union, Sequence, Tuple
+
+from utils.monte_carlo import SimulationResults
+from utils.risk_metrics_numba import NUMBA_AVAILABLE, risk_pack, sorted_tail
+
+if NUMBA_AVAILABLE:
+    from utils.risk_metrics_numba import moments_numba, return_stats_numba
+
+def _moments(values) -> Tuple[float, float, float, float]:
+    """
+    Compute mean, standard deviation, skewness and excess kurtosis.
+    
+    Args:
+        values: 1-D array of returns
+        
+    Returns:
+        Tuple: (mean, population std, bias-corrected skew, bias-corrected excess kurtosis)
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        # Single pass over the data
+        return moments_numba(values)
+    
+    return (
+        np.mean(values), np.std(values),
+        float(_skew(values, bias=False)), float(_kurt(values, bias=False, fisher=True))
+    )
 
 def calculate_var(
-    simulation_results: Dict[str, Any],
+    simulation_results: SimulationResults,
     confidence_level: float = 0.95,
     method: str = 'historical'
 ) -> float:
@@ -25,25 +53,21 @@ def calculate_var(
     final_returns = simulation_results['final_returns']
     
     if method == 'historical':
-        # Historical VaR calculation
-        percentile = 100 * (1 - confidence_level)
-        var = -np.percentile(final_returns, percentile)
+        # Historical VaR calculation (returns are sorted once and reused across levels)
+        (var,), _ = calculate_var_es_bulk(simulation_results, (confidence_level,))
         
     elif method == 'parametric':
         # Parametric VaR calculation
         mean = np.mean(final_returns)
         std = np.std(final_returns)
-        z_score = -np.quantile(np.random.normal(0, 1, 10000), 1 - confidence_level)
+        z_score = -norm.ppf(1 - confidence_level)
         var = -(mean + z_score * std)
         
     elif method == 'cornish_fisher':
         # Cornish-Fisher VaR calculation (adjusts for skew and kurtosis)
-        mean = np.mean(final_returns)
-        std = np.std(final_returns)
-        skew = float(pd.Series(final_returns).skew())
-        kurt = float(pd.Series(final_returns).kurtosis())
+        mean, std, skew, kurt = _moments(final_returns)
         
-        z_score = -np.quantile(np.random.normal(0, 1, 10000), 1 - confidence_level)
+        z_score = -norm.ppf(1 - confidence_level)
         z_cf = (z_score + 
                 (z_score**2 - 1) * skew / 6 + 
                 (z_score**3 - 3 * z_score) * kurt / 24 - 
@@ -54,7 +78,7 @@ def calculate_var(
     return var
 
 def calculate_expected_shortfall(
-    simulation_results: Dict[str, Any],
+    simulation_results: SimulationResults,
     confidence_level: float = 0.95
 ) -> float:
     """
@@ -67,26 +91,44 @@ def calculate_expected_shortfall(
     Returns:
         float: Expected Shortfall as a percentage
     """
-    # Extract final returns
-    final_returns = simulation_results['final_returns']
-    
-    # Calculate VaR
-    var_percentile = 100 * (1 - confidence_level)
-    var = -np.percentile(final_returns, var_percentile)
+    # Mean of the returns beyond the VaR cut-off (returns are sorted once and reused)
+    _, (expected_shortfall,) = calculate_var_es_bulk(simulation_results, (confidence_level,))
     
-    # Calculate Expected Shortfall
-    losses = -final_returns
-    conditional_losses = losses[losses > var]
+    return expected_shortfall
+
+def calculate_var_es_bulk(
+    simulation_results: SimulationResults,
+    confidence_levels: Sequence[float] = (0.95, 0.99)
+) -> Tuple[List[float], List[float]]:
+    """
+    Calculate historical VaR and Expected Shortfall at several confidence levels
+    from the sorted simulated final returns (sorted once by run_monte_carlo_simulation;
+    results without 'sorted_final_returns' are sorted here).
     
-    if len(conditional_losses) == 0:
-        return var  # Fallback if no values exceed VaR
+    Args:
+        simulation_results: Dict containing simulation data
+        confidence_levels: Confidence levels to evaluate (default: 0.95, 0.99)
         
-    expected_shortfall = np.mean(conditional_losses)
+    Returns:
+        Tuple: (VaR values, ES values), each ordered like confidence_levels
+    """
+    sorted_returns = simulation_results.get('sorted_final_returns')
+    if sorted_returns is None:
+        sorted_returns = np.sort(simulation_results['final_returns'])
+    sorted_returns = np.ascontiguousarray(sorted_returns, dtype=np.float64)
     
-    return expected_shortfall
+    var_values = []
+    es_values = []
+    for cl in confidence_levels:
+        # VaR is the interpolated (1 - cl) percentile; ES averages the losses exceeding it
+        quantile, tail_mean = sorted_tail(sorted_returns, cl)
+        var_values.append(-quantile)
+        es_values.append(-tail_mean)
+    
+    return var_values, es_values
 
 def calculate_drawdown_metrics(
-    simulation_results: Dict[str, Any],
+    simulation_results: SimulationResults,
     confidence_level: float = 0.95
 ) -> Dict[str, float]:
     """
@@ -99,27 +141,21 @@ def calculate_drawdown_metrics(
     Returns:
         Dict: Drawdown risk metrics
     """
-    # Extract max drawdowns
-    max_drawdowns = np.array(simulation_results['max_drawdowns'])
+    # Sort max drawdowns once (ascending: worst drawdown first, values are negative)
+    sorted_drawdowns = np.sort(np.asarray(simulation_results['max_drawdowns'], dtype=np.float64))
     
     # Calculate average drawdown
-    avg_drawdown = np.mean(-max_drawdowns)
+    avg_drawdown = -sorted_drawdowns.mean()
     
     # Calculate max drawdown (worst case)
-    max_dd = np.min(max_drawdowns)
+    max_dd = sorted_drawdowns[0]
     
     # Calculate Conditional Drawdown at Risk (CDaR)
-    # Find the threshold drawdown at the specified confidence level
-    dar_percentile = 100 * (1 - confidence_level)
-    dar = -np.percentile(max_drawdowns, dar_percentile)
-    
-    # Calculate the average of drawdowns exceeding the threshold
-    conditional_drawdowns = -max_drawdowns[max_drawdowns < -dar]
-    
-    if len(conditional_drawdowns) == 0:
-        cdar = -dar  # Fallback if no drawdowns exceed the threshold
-    else:
-        cdar = np.mean(conditional_drawdowns)
+    # Find the threshold drawdown at the specified confidence level and
+    # average the drawdowns exceeding it
+    quantile, tail_mean = sorted_tail(sorted_drawdowns, confidence_level)
+    dar = -quantile
+    cdar = -tail_mean
     
     return {
         'avg_drawdown': avg_drawdown,
@@ -129,13 +165,15 @@ def calculate_drawdown_metrics(
     }
 
 def calculate_risk_adjusted_metrics(
-    simulation_results: Dict[str, Any]
+    simulation_results: SimulationResults,
+    drawdown_metrics: Dict[str, float] = None
 ) -> Dict[str, float]:
     """
     Calculate risk-adjusted performance metrics from simulation results.
     
     Args:
         simulation_results: Dict containing simulation data
+        drawdown_metrics: Precomputed result of calculate_drawdown_metrics (optional)
         
     Returns:
         Dict: Risk-adjusted performance metrics
@@ -144,13 +182,21 @@ def calculate_risk_adjusted_metrics(
     final_returns = simulation_results['final_returns']
     annualization_factor = np.sqrt(252 / simulation_results['time_horizon'])  # Annualize based on trading days
     
+    if NUMBA_AVAILABLE:
+        # Mean, volatility and downside deviation (returns below 0) in one pass
+        mean, std, downside_std, n_negative = return_stats_numba(np.ascontiguousarray(final_returns, dtype=np.float64))
+    else:
+        negative_returns = final_returns[final_returns < 0]
+        mean, std = np.mean(final_returns), np.std(final_returns)
+        downside_std = np.std(negative_returns) if len(negative_returns) > 0 else 0.0
+        n_negative = len(negative_returns)
+    
     # Calculate mean return and volatility
-    mean_return = np.mean(final_returns) * annualization_factor
-    volatility = np.std(final_returns) * annualization_factor
+    mean_return = mean * annualization_factor
+    volatility = std * annualization_factor
     
     # Calculate downside deviation (returns below 0)
-    negative_returns = final_returns[final_returns < 0]
-    downside_deviation = np.std(negative_returns) * annualization_factor if len(negative_returns) > 0 else 1e-6
+    downside_deviation = downside_std * annualization_factor if n_negative > 0 else 1e-6
     
     # Calculate risk-free rate (assume 0 for simplicity)
     risk_free_rate = 0.0
@@ -162,7 +208,8 @@ def calculate_risk_adjusted_metrics(
     sortino_ratio = (mean_return - risk_free_rate) / downside_deviation if downside_deviation > 0 else 0
     
     # Calculate Calmar ratio
-    drawdown_metrics = calculate_drawdown_metrics(simulation_results)
+    if drawdown_metrics is None:
+        drawdown_metrics = calculate_drawdown_metrics(simulation_results)
     max_drawdown = drawdown_metrics['max_drawdown']
     calmar_ratio = mean_return / max_drawdown if max_drawdown > 0 else 0
     
@@ -176,7 +223,7 @@ def calculate_risk_adjusted_metrics(
     }
 
 def calculate_comprehensive_risk_profile(
-    simulation_results: Dict[str, Any]
+    simulation_results: SimulationResults
 ) -> Dict[str, Any]:
     """
     Calculate a comprehensive risk profile from simulation results.
@@ -187,20 +234,33 @@ def calculate_comprehensive_risk_profile(
     Returns:
         Dict: Comprehensive risk metrics
     """
-    # Calculate VaR and ES at different confidence levels
-    var_90 = calculate_var(simulation_results, 0.90)
-    var_95 = calculate_var(simulation_results, 0.95)
-    var_99 = calculate_var(simulation_results, 0.99)
-    
-    es_90 = calculate_expected_shortfall(simulation_results, 0.90)
-    es_95 = calculate_expected_shortfall(simulation_results, 0.95)
-    es_99 = calculate_expected_shortfall(simulation_results, 0.99)
+    # Calculate VaR, ES and drawdown metrics at all confidence levels in one kernel call
+    # (risk_pack sorts the returns itself when they are not presorted)
+    levels = np.array([0.90, 0.95, 0.99])
+    sorted_returns = simulation_results.get('sorted_final_returns')
+    presorted = sorted_returns is not None
+    var, es, dar, cdar, avg_drawdown, max_drawdown = risk_pack(
+        np.ascontiguousarray(
+            sorted_returns if presorted else simulation_results['final_returns'],
+            dtype=np.float64
+        ),
+        np.ascontiguousarray(simulation_results['max_drawdowns'], dtype=np.float64),
+        levels,
+        presorted
+    )
+    var_90, var_95, var_99 = var
+    es_90, es_95, es_99 = es
     
-    # Calculate drawdown metrics
-    drawdown_metrics = calculate_drawdown_metrics(simulation_results)
+    # Calculate drawdown metrics (at 95%, like calculate_drawdown_metrics)
+    drawdown_metrics = {
+        'avg_drawdown': avg_drawdown,
+        'max_drawdown': max_drawdown,
+        'drawdown_at_risk': dar[1],
+        'conditional_drawdown_at_risk': cdar[1]
+    }
     
     # Calculate risk-adjusted metrics
-    risk_adjusted_metrics = calculate_risk_adjusted_metrics(simulation_results)
+    risk_adjusted_metrics = calculate_risk_adjusted_metrics(simulation_results, drawdown_metrics)
     
     # Combine all metrics
     risk_profile = {
@@ -218,4 +278,25 @@ def calculate_comprehensive_risk_profile(
         'risk_adjusted_metrics': risk_adjusted_metrics
     }
     
-    return risk_profile
\ No newline at end of file
+    return risk_profile
+
+def calculate_comprehensive_risk_profile_batch(
+    simulation_results_list: Sequence[SimulationResults],
+    max_workers: int = None
+) -> List[Dict[str, Any]]:
+    """
+    Calculate comprehensive risk profiles for several simulations in parallel.
+    
+    The profiles are computed on a thread pool: the sorts and the compiled
+    risk kernels release the GIL, so threads scale without copying the
+    simulation arrays into worker processes.
+    
+    Args:
+        simulation_results_list: Simulation results, e.g. one per stress scenario
+        max_workers: Maximum number of threads (default: ThreadPoolExecutor's default)
+        
+    Returns:
+        List: Risk profiles in the same order as simulation_results_list
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(calculate_comprehensive_risk_profile, simulation_results_list))
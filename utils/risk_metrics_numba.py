@@ -0,0 +1,179 @@
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; risk_metrics falls back to NumPy/pandas
+    NUMBA_AVAILABLE = False
+
+# Explicit signatures compile the kernels eagerly at import (or load them from
+# the on-disk cache), so the first risk calculation in a session does not pay
+# the JIT latency. Only C-contiguous float64 arrays are accepted; callers in
+# risk_metrics convert with np.ascontiguousarray(x, dtype=np.float64) first.
+MOMENTS_SIGNATURES = ['UniTuple(f8, 4)(f8[::1])']
+SORTED_TAIL_SIGNATURES = ['UniTuple(f8, 2)(f8[::1], f8)']
+RISK_PACK_SIGNATURES = ['Tuple((f8[::1], f8[::1], f8[::1], f8[::1], f8, f8))(f8[::1], f8[::1], f8[::1], b1)']
+RETURN_STATS_SIGNATURES = ['Tuple((f8, f8, f8, i8))(f8[::1])']
+
+if NUMBA_AVAILABLE:
+    @njit(MOMENTS_SIGNATURES, cache=True, nogil=True)
+    def moments_numba(x):
+        """
+        Compute mean, standard deviation, skewness and excess kurtosis in one pass.
+
+        Uses Welford's online update of the central moments. The standard
+        deviation is the population value (like np.std); skewness and kurtosis
+        are bias-corrected (like pandas Series.skew and Series.kurtosis).
+
+        Args:
+            x: 1-D float64 array
+
+        Returns:
+            Tuple: (mean, std, skew, excess_kurtosis)
+        """
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        m3 = 0.0
+        m4 = 0.0
+        for value in x:
+            n1 = n
+            n += 1
+            delta = value - mean
+            delta_n = delta / n
+            delta_n2 = delta_n * delta_n
+            term1 = delta * delta_n * n1
+            mean += delta_n
+            m4 += term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * m2 - 4 * delta_n * m3
+            m3 += term1 * delta_n * (n - 2) - 3 * delta_n * m2
+            m2 += term1
+
+        if n == 0:
+            return np.nan, np.nan, np.nan, np.nan
+
+        std = np.sqrt(m2 / n)
+        skew = np.nan
+        kurt = np.nan
+        if m2 == 0.0:
+            # Constant values: no dispersion, pandas reports 0
+            if n >= 3:
+                skew = 0.0
+            if n >= 4:
+                kurt = 0.0
+            return mean, std, skew, kurt
+
+        if n >= 3:
+            g1 = np.sqrt(n) * m3 / m2 ** 1.5
+            skew = np.sqrt(n * (n - 1.0)) / (n - 2.0) * g1
+        if n >= 4:
+            g2 = n * m4 / (m2 * m2) - 3.0
+            kurt = ((n + 1.0) * g2 + 6.0) * (n - 1.0) / ((n - 2.0) * (n - 3.0))
+        return mean, std, skew, kurt
+
+def sorted_tail(sorted_values, level):
+    """
+    Lower quantile of sorted values and the mean of the values below it.
+
+    The quantile is linearly interpolated like
+    np.percentile(values, 100 * (1 - level)), and the tail mean covers the
+    values strictly below it, as the VaR/ES and DaR/CDaR definitions in
+    utils.risk_metrics require.
+
+    Args:
+        sorted_values: 1-D float64 array in ascending order
+        level: Confidence level
+
+    Returns:
+        Tuple: (quantile, tail mean); the tail mean falls back to the
+        quantile when no value lies below it
+    """
+    n = sorted_values.shape[0]
+    h = (n - 1) * (1.0 - level)
+    lo = int(np.floor(h))
+    hi = min(lo + 1, n - 1)
+    quantile = sorted_values[lo] + (h - lo) * (sorted_values[hi] - sorted_values[lo])
+    count = np.searchsorted(sorted_values, quantile)
+    tail_mean = sorted_values[:count].mean() if count > 0 else quantile
+    return quantile, tail_mean
+
+if NUMBA_AVAILABLE:
+    sorted_tail = njit(SORTED_TAIL_SIGNATURES, cache=True, nogil=True)(sorted_tail)
+
+def risk_pack(final_returns, max_drawdowns, levels, presorted=False):
+    """
+    Compute VaR, ES, DaR and CDaR at several confidence levels from one sort.
+
+    Compiled with numba when it is available; the same code runs on NumPy
+    otherwise. Conventions match calculate_var_es_bulk and
+    calculate_drawdown_metrics in utils.risk_metrics.
+
+    Args:
+        final_returns: 1-D float64 array of simulated final returns
+        max_drawdowns: 1-D float64 array of maximum drawdowns (negative values)
+        levels: 1-D float64 array of confidence levels
+        presorted: Whether final_returns is already in ascending order
+
+    Returns:
+        Tuple: (var, es, dar, cdar) arrays ordered like levels, followed by
+        the average and the worst drawdown (both positive)
+    """
+    sorted_returns = final_returns if presorted else np.sort(final_returns)
+    sorted_drawdowns = np.sort(max_drawdowns)
+
+    var = np.empty(levels.shape[0])
+    es = np.empty(levels.shape[0])
+    dar = np.empty(levels.shape[0])
+    cdar = np.empty(levels.shape[0])
+    for i in range(levels.shape[0]):
+        quantile, tail_mean = sorted_tail(sorted_returns, levels[i])
+        var[i] = -quantile
+        es[i] = -tail_mean
+
+        quantile, tail_mean = sorted_tail(sorted_drawdowns, levels[i])
+        dar[i] = -quantile
+        cdar[i] = -tail_mean
+
+    return var, es, dar, cdar, -sorted_drawdowns.mean(), -sorted_drawdowns[0]
+
+if NUMBA_AVAILABLE:
+    risk_pack = njit(RISK_PACK_SIGNATURES, cache=True, fastmath=True, nogil=True)(risk_pack)
+
+if NUMBA_AVAILABLE:
+    @njit(RETURN_STATS_SIGNATURES, cache=True, nogil=True)
+    def return_stats_numba(final_returns):
+        """
+        Compute mean, standard deviation and downside deviation in one pass.
+
+        Keeps Welford running means and squared deviations of all returns and of
+        the negative returns only, replacing the boolean mask and the second
+        np.std pass without the cancellation of the E[x^2] - mean^2 formula.
+
+        Args:
+            final_returns: 1-D float64 array of simulated final returns
+
+        Returns:
+            Tuple: (mean, std, downside std, number of negative returns); both
+            standard deviations are population values like np.std
+        """
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        n_neg = 0
+        mean_neg = 0.0
+        m2_neg = 0.0
+        for value in final_returns:
+            n += 1
+            delta = value - mean
+            mean += delta / n
+            m2 += delta * (value - mean)
+            if value < 0:
+                n_neg += 1
+                delta = value - mean_neg
+                mean_neg += delta / n_neg
+                m2_neg += delta * (value - mean_neg)
+
+        std = np.sqrt(m2 / n)
+        downside_std = 0.0
+        if n_neg > 0:
+            downside_std = np.sqrt(m2_neg / n_neg)
+        return mean, std, downside_std, n_neg
@@ -1,9 +1,111 @@
+import hashlib
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
+from scipy.stats import norm
 from typing import Dict, Any, Optional
 import statsmodels.api as sm
 import pandas.tseries.offsets as offsets
 
+from utils.monte_carlo import SimulationResults
+from utils.risk_metrics import calculate_var, calculate_expected_shortfall
+
+# Number of fitted ARIMA results kept (keyed by input series and order)
+ARIMA_FIT_CACHE_SIZE = 8
+
+@lru_cache(maxsize=1024)
+def _forecast_index(last_date: pd.Timestamp, periods: int) -> pd.DatetimeIndex:
+    """
+    Build the business-day index of the periods following last_date.
+    
+    Cached because repeated forecasts (per scenario or confidence level)
+    start from the same date; DatetimeIndex is immutable, so it can be shared.
+    
+    Args:
+        last_date: Last date of the historical series
+        periods: Number of forecast periods
+        
+    Returns:
+        pd.DatetimeIndex: Forecast dates
+    """
+    return pd.date_range(start=last_date + offsets.BDay(1), periods=periods, freq='B')
+
+class _SeriesKey:
+    """
+    Hashable wrapper of a series for lru_cache, compared by content.
+    
+    Two series are equal keys when their values (SHA-1 digest), first and
+    last dates and lengths match.
+    """
+    __slots__ = ('series', '_key')
+    
+    def __init__(self, series: pd.Series):
+        self.series = series
+        self._key = (
+            hashlib.sha1(series.to_numpy().tobytes()).hexdigest(),
+            series.index[0], series.index[-1], len(series)
+        )
+    
+    def __hash__(self):
+        return hash(self._key)
+    
+    def __eq__(self, other):
+        return isinstance(other, _SeriesKey) and self._key == other._key
+
+@lru_cache(maxsize=ARIMA_FIT_CACHE_SIZE)
+def _fit_arima_cached(series_key: _SeriesKey, order: tuple):
+    model = sm.tsa.ARIMA(
+        series_key.series, 
+        order=order,
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    )
+    return model.fit()
+
+def _fit_arima(series: pd.Series, order: tuple):
+    """
+    Fit an ARIMA model, reusing the fit for an identical series and order.
+    
+    The forecast horizon and confidence level only affect the forecast step,
+    so calls that differ only in those reuse the fitted state-space model.
+    
+    Args:
+        series: float64 time series with a DatetimeIndex
+        order: ARIMA (p, d, q) order
+        
+    Returns:
+        ARIMAResults: Fitted model results
+    """
+    return _fit_arima_cached(_SeriesKey(series), order)
+
+def _fill_missing(values: np.ndarray) -> np.ndarray:
+    """
+    Forward fill NaNs down each column, then back fill leading NaNs.
+    
+    Same result as DataFrame.ffill().bfill(), in one pass over the array.
+    
+    Args:
+        values: 2-D float array (rows are dates)
+        
+    Returns:
+        ndarray: Filled array (the input is returned unchanged if it has no NaNs)
+    """
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    
+    rows = np.arange(len(values))[:, None]
+    cols = np.arange(values.shape[1])
+    
+    # Row of the last valid value at or above each position (0 before the first valid one)
+    source_rows = np.maximum.accumulate(np.where(missing, 0, rows), axis=0)
+    filled = values[source_rows, cols]
+    
+    # Leading NaNs take the first valid value of their column
+    first_valid = values[np.argmax(~missing, axis=0), cols]
+    return np.where(np.isnan(filled), first_valid, filled)
+
 def run_arima_forecast(
     historical_data: pd.DataFrame,
     portfolio_data: pd.DataFrame,
@@ -37,12 +139,14 @@ def run_arima_forecast(
         weights = weights / weights.sum()
     
     # Calculate weighted portfolio values (normalize to 100 at the start)
-    historical_data_filtered = historical_data[available_symbols].copy()
     # Handle NaN values by forward filling, then backward filling any remaining NaNs
-    historical_data_filtered = historical_data_filtered.ffill().bfill()
+    prices = _fill_missing(historical_data[available_symbols].to_numpy(dtype=np.float64))
     
-    # Calculate the weighted sum of asset prices
-    portfolio_values_raw = historical_data_filtered.dot(weights)
+    # Calculate the weighted sum of asset prices (weights ordered like the columns)
+    portfolio_values_raw = pd.Series(
+        prices @ weights.reindex(available_symbols).to_numpy(dtype=np.float64),
+        index=historical_data.index
+    )
     
     # Create a normalized version starting at 100
     portfolio_values = 100 * portfolio_values_raw / portfolio_values_raw.iloc[0]
@@ -66,33 +170,23 @@ def run_arima_forecast(
         # Reindex the series to the new date range
         portfolio_values = portfolio_values.reindex(dates).interpolate(method='linear')
     
-    # Fit ARIMA model
+    # Fit ARIMA model on float64 values
+    portfolio_values = portfolio_values.astype(np.float64)
     try:
-        # Try auto ARIMA
-        model = sm.tsa.ARIMA(
-            portfolio_values, 
-            order=(2, 1, 2),  # Default p=2, d=1, q=2
-            enforce_stationarity=False,
-            enforce_invertibility=False
-        )
-        result = model.fit()
+        result = _fit_arima(portfolio_values, order=(2, 1, 2))  # Default p=2, d=1, q=2
         
         # Create forecast with proper date index
         last_date = portfolio_values.index[-1]
-        forecast_index = pd.date_range(start=last_date + offsets.BDay(1), 
-                                      periods=forecast_periods, 
-                                      freq='B')
+        forecast_index = _forecast_index(last_date, forecast_periods)
         
-        # Get forecast
-        forecast = result.get_forecast(steps=forecast_periods)
-        forecast_values = forecast.predicted_mean
-        forecast_values.index = forecast_index
-        
-        # Get confidence intervals
-        prediction_intervals = forecast.conf_int(alpha=(1 - confidence_level))
-        prediction_intervals.index = forecast_index
-        lower_ci = prediction_intervals.iloc[:, 0]
-        upper_ci = prediction_intervals.iloc[:, 1]
+        # Get forecast mean and confidence intervals from one state-space forecast
+        forecast_frame = result.get_forecast(steps=forecast_periods).summary_frame(
+            alpha=(1 - confidence_level)
+        )
+        forecast_frame.index = forecast_index
+        forecast_values = forecast_frame['mean']
+        lower_ci = forecast_frame['mean_ci_lower']
+        upper_ci = forecast_frame['mean_ci_upper']
         
         # Return results
         return {
@@ -129,40 +223,40 @@ def run_simple_forecast(
     Returns:
         Dict: Forecast results
     """
-    # Calculate mean and standard deviation of returns
-    returns = series.pct_change().dropna()
+    # Calculate mean and standard deviation of returns (pct_change().dropna() on the array)
+    values = series.to_numpy(dtype=np.float64)
+    returns = values[1:] / values[:-1] - 1
+    if np.isnan(returns).any():
+        returns = returns[~np.isnan(returns)]
     mean_return = returns.mean()
-    std_return = returns.std()
+    std_return = returns.std(ddof=1)  # Sample std, like pandas
     
     # Calculate Z-score for confidence interval
-    z_score = abs(np.quantile(np.random.normal(0, 1, 10000), (1 - confidence_level) / 2))
+    z_score = norm.ppf(1 - (1 - confidence_level) / 2)
     
     # Create forecast
-    last_value = series.iloc[-1]
+    last_value = values[-1]
     
     # Use business day frequency for forecast (consistent with ARIMA)
     last_date = series.index[-1]
-    forecast_index = pd.date_range(
-        start=last_date + offsets.BDay(1), 
-        periods=forecast_periods, 
-        freq='B'
-    )
+    forecast_index = _forecast_index(last_date, forecast_periods)
     
     # Create forecast with exponential growth model
+    steps = np.arange(1, forecast_periods + 1)
     forecast_values = pd.Series(
         index=forecast_index,
-        data=[last_value * (1 + mean_return) ** (i + 1) for i in range(forecast_periods)]
+        data=last_value * np.power(1 + mean_return, steps)
     )
     
     # Create confidence intervals
     lower_ci = pd.Series(
         index=forecast_index,
-        data=[last_value * (1 + mean_return - z_score * std_return) ** (i + 1) for i in range(forecast_periods)]
+        data=last_value * np.power(1 + mean_return - z_score * std_return, steps)
     )
     
     upper_ci = pd.Series(
         index=forecast_index,
-        data=[last_value * (1 + mean_return + z_score * std_return) ** (i + 1) for i in range(forecast_periods)]
+        data=last_value * np.power(1 + mean_return + z_score * std_return, steps)
     )
     
     return {
@@ -173,63 +267,8 @@ def run_simple_forecast(
         'model_summary': "Simple exponential forecast (ARIMA failed)"
     }
 
-def calculate_var(
-    simulation_results: Dict,
-    confidence_level: float = 0.95
-) -> float:
-    """
-    Calculate Value at Risk (VaR) from simulation results.
-    
-    Args:
-        simulation_results: Dict containing simulation data
-        confidence_level: Confidence level for VaR calculation (default: 0.95)
-        
-    Returns:
-        float: Value at Risk as a percentage of portfolio value
-    """
-    # Extract final returns from simulations
-    final_returns = simulation_results['final_returns']
-    
-    # Calculate VaR
-    var_percentile = 100 * (1 - confidence_level)
-    var = -np.percentile(final_returns, var_percentile)
-    
-    return var
-
-def calculate_expected_shortfall(
-    simulation_results: Dict,
-    confidence_level: float = 0.95
-) -> float:
-    """
-    Calculate Expected Shortfall (Conditional VaR) from simulation results.
-    
-    Args:
-        simulation_results: Dict containing simulation data
-        confidence_level: Confidence level for ES calculation (default: 0.95)
-        
-    Returns:
-        float: Expected Shortfall as a percentage of portfolio value
-    """
-    # Extract final returns from simulations
-    final_returns = simulation_results['final_returns']
-    
-    # Calculate VaR
-    var_percentile = 100 * (1 - confidence_level)
-    var = -np.percentile(final_returns, var_percentile)
-    
-    # Calculate Expected Shortfall
-    losses = -final_returns
-    conditional_losses = losses[losses > var]
-    
-    if len(conditional_losses) == 0:
-        return var  # Fallback if no values exceed VaR
-        
-    expected_shortfall = np.mean(conditional_losses)
-    
-    return expected_shortfall
-
 def calculate_conditional_drawdown(
-    simulation_results: Dict,
+    simulation_results: SimulationResults,
     confidence_level: float = 0.95
 ) -> float:
     """
@@ -243,24 +282,24 @@ def calculate_conditional_drawdown(
         float: Conditional Drawdown at Risk
     """
     # Extract max drawdowns from simulations
-    max_drawdowns = np.array(simulation_results['max_drawdowns'])
+    max_drawdowns = simulation_results['max_drawdowns']
     
     # Calculate Drawdown at Risk (DaR)
     dar_percentile = 100 * (1 - confidence_level)
     dar = -np.percentile(max_drawdowns, dar_percentile)
     
-    # Calculate Conditional Drawdown at Risk (CDaR)
-    conditional_drawdowns = -max_drawdowns[max_drawdowns < -dar]
+    # Calculate Conditional Drawdown at Risk (CDaR) without copying the tail
+    mask = max_drawdowns < -dar
     
-    if len(conditional_drawdowns) == 0:
+    if not mask.any():
         return -dar  # Fallback if no drawdowns exceed DaR
         
-    cdar = np.mean(conditional_drawdowns)
+    cdar = -np.mean(max_drawdowns, where=mask)
     
     return cdar
 
 def calculate_portfolio_metrics(
-    simulation_results: Dict
+    simulation_results: SimulationResults
 ) -> Dict:
     """
     Calculate comprehensive portfolio risk metrics.
@@ -273,7 +312,7 @@ def calculate_portfolio_metrics(
     """
     # Extract simulation data
     final_returns = simulation_results['final_returns']
-    max_drawdowns = np.array(simulation_results['max_drawdowns'])
+    max_drawdowns = simulation_results['max_drawdowns']
     
     # Calculate basic statistics
     mean_return = np.mean(final_returns)
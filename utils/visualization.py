@@ -1,9 +1,98 @@
+from types import MappingProxyType
+
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
 from typing import Dict, List
 
+try:
+    import datashader as ds
+    DATASHADER_AVAILABLE = True
+except ImportError:  # datashader is optional; paths are then drawn as sampled lines
+    DATASHADER_AVAILABLE = False
+
+# Color palette for various sectors (symbols not listed use DEFAULT_COLOR)
+COLOR_MAP = MappingProxyType({
+    # Blues for Financial
+    'BBCA': '#1f77b4', 'BBRI': '#2a9df4', 'BMRI': '#6baed6', 'BBNI': '#9ecae1', 'BJTM': '#c6dbef',
+    'BTPS': '#d0e0f3', 'BRIS': '#deebf7', 'BDMN': '#e8f4f9', 'BNGA': '#f7fbff',
+    
+    # Greens for Consumer
+    'UNVR': '#2ca02c', 'ICBP': '#4daf4a', 'INDF': '#66bd63', 'KLBF': '#88d27a', 'SIDO': '#a6e08f',
+    'MYOR': '#c2e699', 'GGRM': '#d9f0d3', 'HMSP': '#e6f5d0', 'CPIN': '#f7fcf5', 'JPFA': '#e5f5e0',
+    
+    # Purples for Technology/Telecom
+    'TLKM': '#9467bd', 'EXCL': '#b279a2', 'ISAT': '#c994c7', 'FREN': '#df65b0', 'GOTO': '#e7298a',
+    'BUKA': '#e6a0c4', 'EMTK': '#f4bfdb', 'AKRA': '#fde0ef', 'MNCN': '#fff7fc',
+    
+    # Oranges for Energy/Mining
+    'ADRO': '#ff7f0e', 'PTBA': '#fd8d3c', 'ITMG': '#fdae6b', 'MEDC': '#fdd0a2', 'ANTM': '#fee6ce',
+    'INCO': '#fff5eb', 'TINS': '#ffedd5',
+    
+    # Reds for Infrastructure/Property
+    'SMGR': '#d62728', 'WIKA': '#e7474b', 'WSKT': '#f16d71', 'PTPP': '#fc8e93', 'ADHI': '#fcb5b9',
+    'BSDE': '#fccec2', 'CTRA': '#fde5d9', 'PWON': '#fee9e5', 'SMRA': '#fff5f0', 'LPKR': '#fff0ed',
+    
+    # Other colors for other sectors
+    'ASII': '#8c564b', 'SRIL': '#c49c94', 'INTP': '#e377c2', 'BRPT': '#f7b6d2', 'PGAS': '#7f7f7f',
+    'JSMR': '#bcbd22'
+})
+DEFAULT_COLOR = '#17becf'
+
+# Line colors and legend names of the Monte Carlo percentile lines
+PERCENTILE_COLORS = MappingProxyType({
+    5: 'rgba(255, 0, 0, 0.8)',   # Red
+    25: 'rgba(255, 165, 0, 0.8)', # Orange
+    50: 'rgba(0, 0, 0, 0.8)',     # Black
+    75: 'rgba(0, 128, 0, 0.8)',   # Green
+    95: 'rgba(0, 0, 255, 0.8)'    # Blue
+})
+
+PERCENTILE_NAMES = MappingProxyType({
+    5: 'Persentil ke-5',
+    25: 'Persentil ke-25',
+    50: 'Median',
+    75: 'Persentil ke-75',
+    95: 'Persentil ke-95'
+})
+
+PERCENTILE_HOVER = MappingProxyType({
+    percentile: 'Hari: %{x}<br>' + name + ': %{y:.2%}'
+    for percentile, name in PERCENTILE_NAMES.items()
+})
+
+# Risk metrics shown by plot_risk_metrics, with their labels and tooltips
+RISK_METRICS = ('VaR_95', 'VaR_99', 'ES_95', 'ES_99')
+RISK_LABELS = ('VaR (95%)', 'VaR (99%)', 'Expected Shortfall (95%)', 'Expected Shortfall (99%)')
+
+# Terjemahan untuk tooltip dan label
+RISK_TOOLTIPS = (
+    'Value at Risk dengan tingkat kepercayaan 95%',
+    'Value at Risk dengan tingkat kepercayaan 99%',
+    'Expected Shortfall dengan tingkat kepercayaan 95%',
+    'Expected Shortfall dengan tingkat kepercayaan 99%'
+)
+
+# Forecast plot series longer than this are downsampled with LTTB
+LTTB_POINTS = 2000
+
+# Line style of the sampled Monte Carlo paths
+PATH_LINE = dict(width=0.5, color='rgba(0, 100, 180, 0.1)')
+
+# Size of the datashader raster of all simulation paths (width, height)
+DATASHADER_CANVAS = (900, 400)
+
+# Layout shared by all plots; plot-specific settings are passed alongside it
+BASE_LAYOUT = dict(
+    font=dict(size=14),
+    margin=dict(l=30, r=30, t=80, b=30),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)'
+)
+
+# Generator for sampling which simulation paths to draw
+_RNG = np.random.default_rng()
+
 def plot_portfolio_composition(portfolio_data: pd.DataFrame):
     """
     Create a pie chart visualization of portfolio composition.
@@ -14,82 +103,97 @@ def plot_portfolio_composition(portfolio_data: pd.DataFrame):
     Returns:
         Figure: Plotly figure object with portfolio composition
     """
-    # Create a color palette for various sectors
-    color_map = {
-        # Blues for Financial
-        'BBCA': '#1f77b4', 'BBRI': '#2a9df4', 'BMRI': '#6baed6', 'BBNI': '#9ecae1', 'BJTM': '#c6dbef',
-        'BTPS': '#d0e0f3', 'BRIS': '#deebf7', 'BDMN': '#e8f4f9', 'BNGA': '#f7fbff',
-        
-        # Greens for Consumer
-        'UNVR': '#2ca02c', 'ICBP': '#4daf4a', 'INDF': '#66bd63', 'KLBF': '#88d27a', 'SIDO': '#a6e08f',
-        'MYOR': '#c2e699', 'GGRM': '#d9f0d3', 'HMSP': '#e6f5d0', 'CPIN': '#f7fcf5', 'JPFA': '#e5f5e0',
-        
-        # Purples for Technology/Telecom
-        'TLKM': '#9467bd', 'EXCL': '#b279a2', 'ISAT': '#c994c7', 'FREN': '#df65b0', 'GOTO': '#e7298a',
-        'BUKA': '#e6a0c4', 'EMTK': '#f4bfdb', 'AKRA': '#fde0ef', 'MNCN': '#fff7fc',
-        
-        # Oranges for Energy/Mining
-        'ADRO': '#ff7f0e', 'PTBA': '#fd8d3c', 'ITMG': '#fdae6b', 'MEDC': '#fdd0a2', 'ANTM': '#fee6ce',
-        'INCO': '#fff5eb', 'TINS': '#ffedd5',
-        
-        # Reds for Infrastructure/Property
-        'SMGR': '#d62728', 'WIKA': '#e7474b', 'WSKT': '#f16d71', 'PTPP': '#fc8e93', 'ADHI': '#fcb5b9',
-        'BSDE': '#fccec2', 'CTRA': '#fde5d9', 'PWON': '#fee9e5', 'SMRA': '#fff5f0', 'LPKR': '#fff0ed',
-        
-        # Other colors for other sectors
-        'ASII': '#8c564b', 'SRIL': '#c49c94', 'INTP': '#e377c2', 'BRPT': '#f7b6d2', 'PGAS': '#7f7f7f',
-        'JSMR': '#bcbd22'
-    }
-    
     # Create a list of colors based on symbols in portfolio
-    colors = []
-    for symbol in portfolio_data['Symbol']:
-        if symbol in color_map:
-            colors.append(color_map[symbol])
-        else:
-            # Default color for symbols not in map
-            colors.append('#17becf')
-    
-    # Create a more visually appealing pie chart
-    fig = px.pie(
-        portfolio_data,
-        values='Value',
-        names='Symbol',
-        title='Alokasi Portofolio berdasarkan Nilai Investasi',
-        color_discrete_sequence=colors if colors else px.colors.qualitative.Plotly,
-        hole=0.4,  # Create a donut chart
-        hover_data=['Weight', 'Percentage']
-    )
+    colors = portfolio_data['Symbol'].map(COLOR_MAP).fillna(DEFAULT_COLOR).tolist()
     
-    fig.update_traces(
-        textposition='inside', 
-        textinfo='percent+label',
-        hovertemplate='<b>%{label}</b><br>Nilai: Rp %{value} juta<br>Bobot: %{customdata[0]:.1%}<br>Persentase: %{customdata[1]:.1f}%',
-        marker=dict(line=dict(color='#FFFFFF', width=1))
+    # Create a more visually appealing pie chart (built directly, without plotly.express)
+    fig = go.Figure(
+        go.Pie(
+            labels=portfolio_data['Symbol'].to_numpy(),
+            values=portfolio_data['Value'].to_numpy(),
+            customdata=portfolio_data[['Weight', 'Percentage']].to_numpy(),
+            hole=0.4,  # Create a donut chart
+            textposition='inside',
+            textinfo='percent+label',
+            hovertemplate='<b>%{label}</b><br>Nilai: Rp %{value} juta<br>Bobot: %{customdata[0]:.1%}<br>Persentase: %{customdata[1]:.1f}%',
+            marker=dict(colors=colors, line=dict(color='#FFFFFF', width=1))
+        )
     )
     
     fig.update_layout(
+        BASE_LAYOUT,
+        title='Alokasi Portofolio berdasarkan Nilai Investasi',
         title_font=dict(size=20),
-        font=dict(size=14),
-        legend=dict(orientation='h', yanchor='bottom', y=-0.15),
-        margin=dict(l=30, r=30, t=80, b=30),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)'
+        legend=dict(orientation='h', yanchor='bottom', y=-0.15)
     )
     
     return fig
 
-def plot_monte_carlo_simulations(simulation_results: Dict):
+def _path_density_trace(simulations: np.ndarray, time_points: np.ndarray):
+    """
+    Rasterize all simulation paths into a single density heatmap with datashader.
+    
+    Args:
+        simulations: Cumulative return paths with shape (num_simulations, time_horizon)
+        time_points: Time points for the x-axis
+        
+    Returns:
+        Heatmap: Plotly heatmap of path counts per pixel (log scaled)
+    """
+    paths = pd.DataFrame(np.asarray(simulations, dtype=np.float32))
+    width, height = DATASHADER_CANVAS
+    canvas = ds.Canvas(
+        plot_width=width,
+        plot_height=height,
+        x_range=(time_points[0], time_points[-1]),
+        y_range=(float(np.nanmin(paths.values)), float(np.nanmax(paths.values)))
+    )
+    # One line per row, all rows sharing the same x values
+    agg = canvas.line(paths, x=time_points, y=list(paths.columns), agg=ds.count(), axis=1)
+    counts = agg.values
+    y_dim, x_dim = agg.dims
+    
+    return go.Heatmap(
+        x=agg.coords[x_dim].values,
+        y=agg.coords[y_dim].values,
+        z=np.where(counts > 0, np.log1p(counts), np.nan),  # Empty pixels stay transparent
+        colorscale=[[0, 'rgba(0, 100, 180, 0.1)'], [1, 'rgba(0, 0, 128, 0.8)']],
+        showscale=False,
+        hoverinfo='skip'
+    )
+
+def plot_monte_carlo_simulations(
+    simulation_results: Dict,
+    num_paths_to_show: int = 200,
+    use_datashader: bool = False
+):
     """
     Create a visualization of Monte Carlo simulation results.
     
     Args:
-        simulation_results: Dict containing simulation data
+        simulation_results: Dict containing simulation paths, or the
+            'simulations_path' of paths saved by save_simulation_paths,
+            optionally with precomputed 'percentiles'
+        num_paths_to_show: Maximum number of individual paths to draw
+        use_datashader: Draw all paths as one datashader density layer instead
+            of a sample of individual lines (falls back to the sampled lines
+            when datashader is not installed)
         
     Returns:
         Figure: Plotly figure object with simulation paths
     """
-    simulations = simulation_results['simulations']
+    # datashader is optional (ImportError at import time): draw the sampled lines without it
+    use_datashader = use_datashader and DATASHADER_AVAILABLE
+    
+    if 'simulations_path' in simulation_results:
+        # Memory-map saved paths; only the plotted rows are read from disk
+        try:
+            simulations = np.load(simulation_results['simulations_path'], mmap_mode='r')
+        except FileNotFoundError:
+            # The saved paths are gone (e.g. temp directory cleanup); draw the percentiles only
+            simulations = None
+    else:
+        simulations = simulation_results['simulations']
     time_horizon = simulation_results['time_horizon']
     
     # Create figure
@@ -98,58 +202,67 @@ def plot_monte_carlo_simulations(simulation_results: Dict):
     # Time points for x-axis
     time_points = np.arange(time_horizon)
     
-    # Add simulation paths (randomly select 100 paths to avoid clutter)
-    num_paths_to_show = min(100, len(simulations))
-    indices = np.random.choice(len(simulations), num_paths_to_show, replace=False)
+    if simulations is None:
+        path_traces = []
+    elif use_datashader:
+        # Rasterize every path server-side into one layer under the percentile lines
+        path_traces = [_path_density_trace(simulations, time_points)]
+    else:
+        # Add simulation paths (randomly select a subset to avoid clutter)
+        num_paths_to_show = min(num_paths_to_show, len(simulations))
+        # Sample distinct indices without permuting all of them (shuffle=False)
+        indices = np.sort(_RNG.choice(len(simulations), num_paths_to_show, replace=False, shuffle=False))
+        sampled_paths = np.asarray(simulations[indices], dtype=np.float32)
+        
+        # All paths go into one WebGL trace, separated by NaN to break the line
+        # (the few percentile lines below stay SVG)
+        num_sampled = len(sampled_paths)
+        # (float32 throughout: Plotly sends arrays as typed binary, so this halves the payload)
+        path_x = np.tile(np.append(time_points, np.nan).astype(np.float32), num_sampled)
+        path_y = np.column_stack([sampled_paths, np.full((num_sampled, 1), np.nan, dtype=np.float32)]).ravel()
+        # Plain dict: validated once when added to the figure, not also on construction
+        path_traces = [dict(
+            type='scattergl',
+            x=path_x,
+            y=path_y,
+            mode='lines',
+            line=PATH_LINE,
+            showlegend=False,
+            hoverinfo='skip'
+        )]
     
-    for i in indices:
-        fig.add_trace(
-            go.Scatter(
-                x=time_points,
-                y=simulations[i],
-                mode='lines',
-                line=dict(width=0.5, color='rgba(0, 100, 180, 0.1)'),
-                showlegend=False,
-                hoverinfo='skip'
-            )
-        )
+    # Use precomputed percentiles when available, otherwise compute per time point
+    percentiles = simulation_results.get('percentiles')
+    if percentiles is None:
+        # All levels in one pass over the paths
+        percentile_levels = [5, 25, 50, 75, 95]
+        percentiles = dict(zip(
+            percentile_levels,
+            np.percentile(np.asarray(simulations), percentile_levels, axis=0).astype(np.float32)
+        ))
     
-    # Calculate percentiles for each time point
-    percentiles = {}
-    for percentile in [5, 25, 50, 75, 95]:
-        percentiles[percentile] = np.percentile(simulations, percentile, axis=0)
-    
-    # Add percentile lines
-    percentile_colors = {
-        5: 'rgba(255, 0, 0, 0.8)',   # Red
-        25: 'rgba(255, 165, 0, 0.8)', # Orange
-        50: 'rgba(0, 0, 0, 0.8)',     # Black
-        75: 'rgba(0, 128, 0, 0.8)',   # Green
-        95: 'rgba(0, 0, 255, 0.8)'    # Blue
-    }
-    
-    percentile_names = {
-        5: 'Persentil ke-5',
-        25: 'Persentil ke-25',
-        50: 'Median',
-        75: 'Persentil ke-75',
-        95: 'Persentil ke-95'
-    }
-    
-    for percentile, values in percentiles.items():
-        fig.add_trace(
-            go.Scatter(
-                x=time_points,
-                y=values,
-                mode='lines',
-                line=dict(width=2, color=percentile_colors[percentile]),
-                name=percentile_names[percentile],
-                hovertemplate='Hari: %{x}<br>' + percentile_names[percentile] + ': %{y:.2%}'
-            )
+    # Percentile lines; each band between consecutive percentiles is shaded
+    percentile_traces = [
+        dict(
+            type='scatter',
+            x=time_points,
+            y=values,
+            mode='lines',
+            line=dict(width=2, color=PERCENTILE_COLORS[percentile]),
+            fill='tonexty' if i > 0 else None,
+            fillcolor='rgba(0, 100, 180, 0.08)',
+            name=PERCENTILE_NAMES[percentile],
+            hovertemplate=PERCENTILE_HOVER[percentile]
         )
+        for i, (percentile, values) in enumerate(percentiles.items())
+    ]
+    
+    # Add all traces in one call
+    fig.add_traces(path_traces + percentile_traces)
     
     # Update layout
     fig.update_layout(
+        BASE_LAYOUT,
         title='Hasil Simulasi Monte Carlo',
         xaxis_title='Hari Perdagangan',
         yaxis_title='Return Kumulatif',
@@ -161,9 +274,7 @@ def plot_monte_carlo_simulations(simulation_results: Dict):
             y=1.02,
             xanchor="right",
             x=1
-        ),
-        font=dict(size=14),
-        margin=dict(l=30, r=30, t=80, b=30)
+        )
     )
     
     # Add zero line
@@ -182,40 +293,30 @@ def plot_risk_metrics(risk_metrics: Dict):
         Figure: Plotly figure object with risk metrics
     """
     # Extract metrics and prepare for plotting
-    metrics_to_plot = ['VaR_95', 'VaR_99', 'ES_95', 'ES_99']
-    values = [risk_metrics[metric] for metric in metrics_to_plot]
-    labels = ['VaR (95%)', 'VaR (99%)', 'Expected Shortfall (95%)', 'Expected Shortfall (99%)']
-    
-    # Terjemahan untuk tooltip dan label
-    tooltips = [
-        'Value at Risk dengan tingkat kepercayaan 95%',
-        'Value at Risk dengan tingkat kepercayaan 99%',
-        'Expected Shortfall dengan tingkat kepercayaan 95%',
-        'Expected Shortfall dengan tingkat kepercayaan 99%'
-    ]
+    values = np.fromiter((risk_metrics[metric] for metric in RISK_METRICS), dtype=np.float64, count=len(RISK_METRICS))
     
     # Create bar chart with hover information
     fig = go.Figure(data=[
         go.Bar(
-            x=labels,
+            x=RISK_LABELS,
             y=values,
-            text=[f"{v:.2%}" for v in values],
+            text=[f"{v:.2%}" for v in values.tolist()],
             textposition='auto',
             marker_color=['rgba(255, 99, 132, 0.7)', 'rgba(255, 49, 89, 0.9)', 
                           'rgba(255, 159, 64, 0.7)', 'rgba(255, 120, 24, 0.9)'],
             hovertemplate='%{x}<br>Nilai: %{y:.2%}<br><b>%{text}</b><extra></extra>',
-            customdata=tooltips
+            customdata=RISK_TOOLTIPS
         )
     ])
     
     # Update layout
     fig.update_layout(
+        BASE_LAYOUT,
         title='Metrik Risiko Portofolio',
         xaxis_title='Metrik',
         yaxis_title='Nilai (dalam % dari portofolio)',
         yaxis_tickformat='.1%',
-        yaxis_range=[0, max(values) * 1.2],  # Add some padding at the top
-        font=dict(size=14),
+        yaxis_range=[0, values.max() * 1.2],  # Add some padding at the top
         margin=dict(l=30, r=30, t=80, b=150),  # Increased bottom margin for annotation
         xaxis=dict(
             tickangle=0,  # Horizontal labels
@@ -254,13 +355,61 @@ def plot_risk_metrics(risk_metrics: Dict):
     
     return fig
 
-def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float = None):
+def _lttb(values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select points with Largest-Triangle-Three-Buckets downsampling.
+    
+    Points are treated as evenly spaced (one per trading day). The first and
+    last points are always kept; every bucket in between keeps the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    
+    Args:
+        values: 1-D array of series values
+        n_out: Number of points to keep
+        
+    Returns:
+        np.ndarray: Sorted indices of the points to keep
+    """
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    
+    selected = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = (stop + next_stop - 1) / 2
+        avg_y = values[stop:next_stop].mean()
+        
+        # Twice the triangle area for every candidate in the bucket
+        candidates = np.arange(start, stop)
+        area = np.abs(
+            (selected - avg_x) * (values[start:stop] - values[selected])
+            - (selected - candidates) * (avg_y - values[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[i + 1] = selected
+    
+    return indices
+
+def plot_time_series_forecast(
+    forecast_data: Dict,
+    total_portfolio_value: float = None,
+    downsample: bool = True
+):
     """
     Create a visualization of time series forecast.
     
     Args:
         forecast_data: Dict containing forecast data
         total_portfolio_value: Total portfolio value in million Rupiah (optional)
+        downsample: Reduce series longer than LTTB_POINTS with LTTB downsampling
         
     Returns:
         Figure: Plotly figure object with forecast
@@ -272,6 +421,20 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
         lower_ci = forecast_data['lower_ci']
         upper_ci = forecast_data['upper_ci']
         
+        # Work on plain arrays from here on (the CI bounds share the forecast dates)
+        historical_x = historical_values.index.to_numpy()
+        forecast_x = forecast_values.index.to_numpy()
+        
+        # Copy the values once; scaling below happens in place on these copies
+        # (forecast and CI bounds share one (3, periods) array, scaled in one multiply)
+        historical_y = historical_values.to_numpy(dtype=np.float64, copy=True)
+        forecast_band = np.array([
+            forecast_values.to_numpy(dtype=np.float64),
+            lower_ci.to_numpy(dtype=np.float64),
+            upper_ci.to_numpy(dtype=np.float64)
+        ])
+        first_value = historical_y[0]
+        
         # Get total portfolio value in millions for scaling
         # If not provided, default to normalized values (basis 100)
         scale_in_millions = False
@@ -279,22 +442,30 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
             scale_in_millions = True
             base_value = total_portfolio_value
             # Don't normalize to 100, use actual value in millions
-            if abs(historical_values.iloc[0] - 100) < 1:  # If already normalized to 100
+            if abs(first_value - 100) < 1:  # If already normalized to 100
                 # Scale values by the total portfolio value
                 scaling_factor = base_value / 100
-                historical_values = historical_values * scaling_factor
-                forecast_values = forecast_values * scaling_factor
-                lower_ci = lower_ci * scaling_factor
-                upper_ci = upper_ci * scaling_factor
+                historical_y *= scaling_factor
+                forecast_band *= scaling_factor
         else:
             # Default case: normalize to 100 for percentage representation
-            if abs(historical_values.iloc[0] - 100) > 1:  # If not already normalized
+            if abs(first_value - 100) > 1:  # If not already normalized
                 print("Normalizing historical and forecast values to start at 100")
-                norm_factor = 100 / historical_values.iloc[0]
-                historical_values = historical_values * norm_factor
-                forecast_values = forecast_values * norm_factor
-                lower_ci = lower_ci * norm_factor
-                upper_ci = upper_ci * norm_factor
+                norm_factor = 100 / first_value
+                historical_y *= norm_factor
+                forecast_band *= norm_factor
+        
+        # Keep long series to LTTB_POINTS visually representative points
+        if downsample and len(historical_y) > LTTB_POINTS:
+            keep = _lttb(historical_y, LTTB_POINTS)
+            historical_x, historical_y = historical_x[keep], historical_y[keep]
+        if downsample and forecast_band.shape[1] > LTTB_POINTS:
+            keep = _lttb(forecast_band[0], LTTB_POINTS)
+            forecast_x, forecast_band = forecast_x[keep], forecast_band[:, keep]
+        
+        # Plotted values are sent as float32 (halves the figure payload)
+        historical_y = historical_y.astype(np.float32)
+        forecast_y, lower_y, upper_y = forecast_band.astype(np.float32)
         
         # Create larger figure with specific height and width
         fig = go.Figure(layout=dict(
@@ -303,13 +474,18 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
             height=600
         ))
         
+        # Traces are collected and added to the figure in one call
+        traces = []
+        
         # Add historical values with better formatting for millions
         hovertemplate = 'Tanggal: %{x|%Y-%m-%d}<br>Nilai: Rp %{y:.2f} juta' if scale_in_millions else 'Tanggal: %{x|%Y-%m-%d}<br>Nilai: %{y:.2f}'
         
-        fig.add_trace(
-            go.Scatter(
-                x=historical_values.index,
-                y=historical_values.values,
+        # Line traces use WebGL (long daily histories); the filled confidence
+        # polygon below stays SVG, where fills render reliably
+        traces.append(
+            go.Scattergl(
+                x=historical_x,
+                y=historical_y,
                 mode='lines',
                 name='Historis',
                 line=dict(color='blue', width=2.5),
@@ -320,10 +496,10 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
         # Add forecast with better formatting
         forecast_hover = 'Tanggal: %{x|%Y-%m-%d}<br>Peramalan: Rp %{y:.2f} juta' if scale_in_millions else 'Tanggal: %{x|%Y-%m-%d}<br>Peramalan: %{y:.2f}'
         
-        fig.add_trace(
-            go.Scatter(
-                x=forecast_values.index,
-                y=forecast_values.values,
+        traces.append(
+            go.Scattergl(
+                x=forecast_x,
+                y=forecast_y,
                 mode='lines',
                 name='Peramalan',
                 line=dict(color='red', width=2.5),
@@ -333,11 +509,11 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
         
         # Add confidence interval as shaded area with better error handling
         try:
-            # Convert indices to list to handle different index types safely
-            x_values = list(forecast_values.index) + list(forecast_values.index)[::-1]
-            y_values = list(upper_ci.values) + list(lower_ci.values)[::-1]
+            # Polygon along the upper bound and back along the lower bound
+            x_values = np.concatenate([forecast_x, forecast_x[::-1]])
+            y_values = np.concatenate([upper_y, lower_y[::-1]])
             
-            fig.add_trace(
+            traces.append(
                 go.Scatter(
                     x=x_values,
                     y=y_values,
@@ -353,10 +529,10 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
             # Fall back to separate lines for confidence intervals
             ci_hover = 'Tanggal: %{x|%Y-%m-%d}<br>Batas Bawah: Rp %{y:.2f} juta' if scale_in_millions else 'Tanggal: %{x|%Y-%m-%d}<br>Batas Bawah: %{y:.2f}'
             
-            fig.add_trace(
+            traces.append(
                 go.Scatter(
-                    x=lower_ci.index,
-                    y=lower_ci.values,
+                    x=forecast_x,
+                    y=lower_y,
                     mode='lines',
                     line=dict(color='rgba(255, 0, 0, 0.5)', width=1, dash='dash'),
                     name='Batas Bawah (95%)',
@@ -366,10 +542,10 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
             
             ci_hover_upper = 'Tanggal: %{x|%Y-%m-%d}<br>Batas Atas: Rp %{y:.2f} juta' if scale_in_millions else 'Tanggal: %{x|%Y-%m-%d}<br>Batas Atas: %{y:.2f}'
             
-            fig.add_trace(
+            traces.append(
                 go.Scatter(
-                    x=upper_ci.index,
-                    y=upper_ci.values,
+                    x=forecast_x,
+                    y=upper_y,
                     mode='lines',
                     line=dict(color='rgba(255, 0, 0, 0.5)', width=1, dash='dash'),
                     name='Batas Atas (95%)',
@@ -377,11 +553,14 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
                 )
             )
         
+        fig.add_traces(traces)
+        
         # Prepare title and axis labels based on scale
         y_axis_title = 'Nilai Portofolio (dalam juta Rupiah)' if scale_in_millions else 'Nilai Portofolio (basis 100)'
         
         # Update layout with improved Indonesian titles and formatting
         fig.update_layout(
+            BASE_LAYOUT,
             title={
                 'text': 'Peramalan Deret Waktu Portfolio',
                 'font': {'size': 20}
@@ -408,13 +587,12 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
                 x=1,
                 font=dict(size=12)
             ),
-            font=dict(size=14),
             margin=dict(l=50, r=50, t=100, b=150),  # Memperbesar margin untuk akomodasi judul dan anotasi
             plot_bgcolor='rgba(250, 250, 250, 0.5)'
         )
         
         # Perbarui anotasi penjelasan sesuai dengan skala nilai
-        annotation_text1 = f'Nilai menggunakan skala juta Rupiah dengan modal awal Rp {historical_values.iloc[0]:.2f} juta.' if scale_in_millions else 'Nilai dimulai dari basis 100 pada awal periode.'
+        annotation_text1 = f'Nilai menggunakan skala juta Rupiah dengan modal awal Rp {historical_y[0]:.2f} juta.' if scale_in_millions else 'Nilai dimulai dari basis 100 pada awal periode.'
         
         # Tambahkan anotasi penjelasan pada dua baris
         fig.add_annotation(
@@ -453,11 +631,10 @@ def plot_time_series_forecast(forecast_data: Dict, total_portfolio_value: float
         )
         
         fig.update_layout(
+            BASE_LAYOUT,
             title='Peramalan Deret Waktu (Error)',
             xaxis_title='Tanggal',
-            yaxis_title='Nilai',
-            font=dict(size=14),
-            margin=dict(l=30, r=30, t=80, b=30)
+            yaxis_title='Nilai'
         )
         
         return fig
\ No newline at end of file